@@ -0,0 +1,208 @@
+import gzip
+import threading
+import time
+import zlib
+from typing import Iterable, Iterator
+
+import brotli
+from fastapi import Request
+
+from app.core.config import settings
+
+# Server preference when the client ranks both equally.
+ENCODINGS = ("br", "gzip")
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+# Stored copies are compressed once per sync version, so they can afford the slow levels.
+STORED_LEVELS = {"br": 9, "gzip": 9}
+# Streams have no known size to budget against; they always use the cheapest level.
+FAST_LEVELS = {"br": 1, "gzip": 1}
+# Assumed throughput (bytes per ms) of a level until it has been measured.
+INITIAL_RATE = 20_000
+
+
+def parse_accept(header: str) -> list[tuple[str, float]]:
+    """``(value, q)`` pairs of an Accept-style header, lowercased, in header order."""
+    entries = []
+    for part in header.split(","):
+        value, *params = [piece.strip() for piece in part.split(";")]
+        if not value:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, raw = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(raw)
+                except ValueError:
+                    q = 0.0
+        entries.append((value.lower(), q))
+    return entries
+
+
+def negotiate_encoding(request: Request) -> str | None:
+    """"br" or "gzip", whichever Accept-Encoding ranks highest; None for identity."""
+    if not settings.response_compression_enabled:
+        return None
+    ranks = dict(parse_accept(request.headers.get("accept-encoding", "")))
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        q = ranks.get(encoding, ranks.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def default_level(encoding: str) -> int:
+    return settings.response_brotli_quality if encoding == "br" else settings.response_gzip_level
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    # mtime=0 keeps the output identical for identical input.
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+class CompressionRates:
+    """Moving average of the measured throughput of each (encoding, level)."""
+
+    def __init__(self):
+        self._rates: dict[tuple[str, int], float] = {}
+        self._lock = threading.Lock()
+
+    def estimate_ms(self, encoding: str, level: int, size: int) -> float:
+        with self._lock:
+            rate = self._rates.get((encoding, level), INITIAL_RATE)
+        return size / rate
+
+    def record(self, encoding: str, level: int, size: int, elapsed_ms: float):
+        rate = size / max(elapsed_ms, 0.01)
+        with self._lock:
+            previous = self._rates.get((encoding, level))
+            self._rates[(encoding, level)] = rate if previous is None else 0.8 * previous + 0.2 * rate
+
+
+rates = CompressionRates()
+
+
+def _timed_compress(data: bytes, encoding: str, level: int) -> bytes:
+    started = time.perf_counter()
+    compressed = compress(data, encoding, level)
+    rates.record(encoding, level, len(data), (time.perf_counter() - started) * 1000)
+    return compressed
+
+
+def compress_body(data: bytes, encoding: str, budget: bool = True) -> bytes | None:
+    """``data`` compressed with ``encoding``, or None when it is not worth it.
+
+    Bodies under ``response_compression_min_bytes`` stay as they are. With
+    ``budget``, the configured level is used when its estimated time fits
+    ``response_compression_cpu_budget_ms``, the fastest level when only that
+    fits, and the body goes out uncompressed otherwise. Callers that keep the
+    result pass ``budget=False``: that cost is paid once.
+    """
+    if len(data) < settings.response_compression_min_bytes:
+        return None
+    level = default_level(encoding)
+    if budget:
+        limit = settings.response_compression_cpu_budget_ms
+        if rates.estimate_ms(encoding, level, len(data)) > limit:
+            level = FAST_LEVELS[encoding]
+            if rates.estimate_ms(encoding, level, len(data)) > limit:
+                return None
+    compressed = _timed_compress(data, encoding, level)
+    return compressed if len(compressed) < len(data) else None
+
+
+def compress_chunks(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    """Compress a byte stream chunk by chunk, flushing after each one so the
+    client can decode as data arrives."""
+    level = FAST_LEVELS[encoding]
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=level)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def compress_file(source: str, target: str, encoding: str, chunk_size: int = 256 * 1024):
+    """Write the compressed copy of ``source`` to ``target`` in chunks, at the stored level."""
+    level = STORED_LEVELS[encoding]
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=level)
+            while chunk := src.read(chunk_size):
+                dst.write(compressor.process(chunk))
+            dst.write(compressor.finish())
+        else:
+            compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            while chunk := src.read(chunk_size):
+                dst.write(compressor.compress(chunk))
+            dst.write(compressor.flush())
+
+
+def add_vary(headers: dict, field: str) -> dict:
+    values = [value.strip() for value in headers.get("Vary", "").split(",") if value.strip()]
+    if field not in values:
+        values.append(field)
+    return {**headers, "Vary": ", ".join(values)}
+
+
+def encoded_etag(etag: str | None, encoding: str) -> str | None:
+    """Strong ETag of the ``encoding`` representation: ``"<tag>-<encoding>"``."""
+    if not etag or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def strip_encoding(etag: str) -> str:
+    """Inverse of :func:`encoded_etag`, so conditional requests match either representation."""
+    for encoding in ENCODINGS:
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[: -len(suffix)] + '"'
+    return etag
+
+
+def revalidated_etag(request: Request, etag: str, compressible: bool = True) -> str:
+    """ETag of the representation a conditional request revalidates.
+
+    That is the (possibly encoded) variant of ``etag`` the client sent in
+    If-None-Match, or else the one Accept-Encoding would get now. Bodies that
+    are never compressed always have the plain ``etag``.
+    """
+    if not compressible:
+        return etag
+    for candidate in request.headers.get("if-none-match", "").split(","):
+        candidate = candidate.strip()
+        if strip_encoding(candidate) == etag:
+            return candidate
+    encoding = negotiate_encoding(request)
+    return encoded_etag(etag, encoding) if encoding else etag
+
+
+def not_modified_headers(request: Request, headers: dict, compressible: bool = True) -> dict:
+    """``headers`` for a 304: Vary plus the revalidated representation's ETag."""
+    headers = add_vary(headers, "Accept-Encoding") if settings.response_compression_enabled else dict(headers)
+    if "ETag" in headers:
+        headers["ETag"] = revalidated_etag(request, headers["ETag"], compressible)
+    return headers
+
+
+def encoding_headers(headers: dict, encoding: str | None) -> dict:
+    """``headers`` for a body sent with ``encoding`` (None: uncompressed)."""
+    headers = add_vary(headers, "Accept-Encoding") if settings.response_compression_enabled else dict(headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+        if "ETag" in headers:
+            headers["ETag"] = encoded_etag(headers["ETag"], encoding)
+    return headers
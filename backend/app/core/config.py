@@ -21,5 +21,25 @@ class Settings(BaseModel):
     pricing_master_path: str = os.getenv("PRICING_MASTER_PATH", "/app/TABELA_PRECOS_UF.xlsx")
     pricing_discounts_path: str = os.getenv("PRICING_DISCOUNTS_PATH", "/app/DESCONTOS_PARA_CARGA.xlsm")
     pricing_client_program_path: str = os.getenv("PRICING_CLIENT_PROGRAM_PATH", "/app/JAC_PROG_DESC_CLIENTE.csv")
+    pricing_parse_workers: int = int(os.getenv("PRICING_PARSE_WORKERS", "5"))
+    pricing_source_cache_dir: str = os.getenv("PRICING_SOURCE_CACHE_DIR", "")
+    pricing_sync_staging: bool = os.getenv("PRICING_SYNC_STAGING", "true").lower() in {"1", "true", "yes"}
+    pricing_sync_job_timeout_minutes: int = int(os.getenv("PRICING_SYNC_JOB_TIMEOUT_MINUTES", "60"))
+    pricing_warmup_enabled: bool = os.getenv("PRICING_WARMUP_ENABLED", "true").lower() in {"1", "true", "yes"}
+    pricing_warmup_workers: int = int(os.getenv("PRICING_WARMUP_WORKERS", "4"))
+    pricing_warmup_all_ufs: bool = os.getenv("PRICING_WARMUP_ALL_UFS", "true").lower() in {"1", "true", "yes"}
+    pricing_artifact_dir: str = os.getenv("PRICING_ARTIFACT_DIR", "/app/uploads/pricing")
+    pricing_artifact_warmup: bool = os.getenv("PRICING_ARTIFACT_WARMUP", "false").lower() in {"1", "true", "yes"}
+    pricing_snapshot_enabled: bool = os.getenv("PRICING_SNAPSHOT_ENABLED", "true").lower() in {"1", "true", "yes"}
+    pricing_snapshot_dir: str = os.getenv("PRICING_SNAPSHOT_DIR", "/app/uploads/pricing-snapshot")
+    pricing_rows_cache_mb: int = int(os.getenv("PRICING_ROWS_CACHE_MB", "256"))
+    pricing_rows_cache_ttl_seconds: int = int(os.getenv("PRICING_ROWS_CACHE_TTL_SECONDS", "600"))
+    pricing_compute_lock_timeout_seconds: int = int(os.getenv("PRICING_COMPUTE_LOCK_TIMEOUT_SECONDS", "60"))
+    response_compression_enabled: bool = os.getenv("RESPONSE_COMPRESSION_ENABLED", "true").lower() in {"1", "true", "yes"}
+    response_compression_min_bytes: int = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+    response_compression_cpu_budget_ms: int = int(os.getenv("RESPONSE_COMPRESSION_CPU_BUDGET_MS", "50"))
+    response_compression_cache_mb: int = int(os.getenv("RESPONSE_COMPRESSION_CACHE_MB", "64"))
+    response_gzip_level: int = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+    response_brotli_quality: int = int(os.getenv("RESPONSE_BROTLI_QUALITY", "4"))
 
 settings = Settings()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Enum, ForeignKey, Table, Boolean, DateTime, Date, Numeric, Float, UniqueConstraint, Index
+from sqlalchemy import Column, Integer, String, Enum, ForeignKey, Table, Boolean, DateTime, Date, Numeric, Float, Text, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from app.db import Base
 
@@ -100,6 +100,7 @@ class PricingMasterItem(Base):
 
     __table_args__ = (
         Index("ix_pricing_master_uf_cod_item", "uf", "cod_item"),
+        Index("ix_pricing_master_cod_item_uf", "cod_item", "uf"),
     )
 
 
@@ -129,6 +130,10 @@ class PricingProgramItemDiscount(Base):
     desc_prog = Column(String(100), nullable=True)
     desc_camp = Column(String(100), nullable=True)
     vald_camp = Column(DateTime, nullable=True)
+    desc_seq = Column(String(255), nullable=True)
+    desc_factors = Column(Text, nullable=True)
+    camp_seq = Column(String(100), nullable=True)
+    camp_factors = Column(Text, nullable=True)
 
     __table_args__ = (
         Index("ix_pricing_program_item_programa_categoria_item", "programa", "categoria", "cod_item"),
@@ -142,6 +147,8 @@ class PricingClientItemDiscount(Base):
     cod_cliente = Column(String(20), nullable=False)
     cod_item = Column(String(30), nullable=False)
     desc_cli = Column(String(100), nullable=True)
+    desc_seq = Column(String(100), nullable=True)
+    desc_factors = Column(Text, nullable=True)
 
     __table_args__ = (
         Index("ix_pricing_client_item_cod_cliente_item", "cod_cliente", "cod_item"),
@@ -155,9 +162,12 @@ class PricingUfItemDiscount(Base):
     cod_uf = Column(String(2), nullable=False)
     cod_item = Column(String(30), nullable=False)
     desc_uf = Column(String(100), nullable=True)
+    desc_seq = Column(String(100), nullable=True)
+    desc_factors = Column(Text, nullable=True)
 
     __table_args__ = (
         Index("ix_pricing_uf_item_cod_uf_item", "cod_uf", "cod_item"),
+        Index("ix_pricing_uf_item_cod_item", "cod_item"),
     )
 
 
@@ -186,3 +196,53 @@ class PricingResultCache(Base):
         UniqueConstraint("cnpj", "uf", "programa", "categoria", "cod_item", name="uq_pricing_cache_cnpj_uf_prog_cat_item"),
     )
 
+
+class PricingBaseCache(Base):
+    __tablename__ = "pricing_base_cache"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    uf = Column(String(2), nullable=False)
+    cod_item = Column(String(30), nullable=False)
+    den_item = Column(String(255), nullable=True)
+    pre_unit = Column(Float, nullable=False, default=0.0)
+    descontos_cascata = Column(String(255), nullable=True)
+    base_liquida = Column(Float, nullable=False, default=0.0)
+    aliq_ipi = Column(Float, nullable=False, default=0.0)
+    aliq_st = Column(Float, nullable=False, default=0.0)
+    valor_ipi = Column(Float, nullable=False, default=0.0)
+    valor_st = Column(Float, nullable=False, default=0.0)
+    valor_final = Column(Float, nullable=False, default=0.0)
+    programa = Column(String(60), nullable=False)
+    categoria = Column(String(60), nullable=False)
+    source = Column(String(30), nullable=False, default="db")
+    updated_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("uf", "programa", "categoria", "cod_item", name="uq_pricing_base_cache_uf_prog_cat_item"),
+    )
+
+
+class PricingSyncState(Base):
+    __tablename__ = "pricing_sync_state"
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=True)
+
+
+class PricingSyncJob(Base):
+    __tablename__ = "pricing_sync_jobs"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    mode = Column(String(20), nullable=False)
+    status = Column(Enum("queued", "running", "succeeded", "failed"), nullable=False, default="queued")
+    phase = Column(String(30), nullable=True)
+    rows_processed = Column(Integer, nullable=False, default=0)
+    result = Column(Text, nullable=True)
+    error = Column(String(500), nullable=True)
+    requested_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_pricing_sync_jobs_status", "status"),
+    )
@@ -0,0 +1,193 @@
+import csv
+import hashlib
+import io
+import logging
+import os
+import shutil
+import threading
+from typing import Callable, Iterable, Iterator
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+
+from app.compression import ENCODING_SUFFIXES, compress_file
+from app.core.config import settings
+from app.versioned_dirs import version_dirs
+
+logger = logging.getLogger(__name__)
+ARTIFACT_EXTENSIONS = {"csv": ".csv", "excel": ".xlsx"}
+CSV_CHUNK_BYTES = 64 * 1024
+
+
+def artifact_root() -> str:
+    target = settings.pricing_artifact_dir or os.path.join(settings.upload_dir, "pricing")
+    os.makedirs(target, exist_ok=True)
+    return target
+
+
+def artifact_path(version: int, cnpj: str, uf: str, programa: str, categoria: str, fmt: str) -> str:
+    """Where the download for one priced table lives.
+
+    A table's content is fully determined by the sync version and its
+    (cnpj, uf, programa, categoria) key, so files are addressed by those:
+    ``<root>/v<version>/<sha256(key)>.<ext>``.
+    """
+    key = f"{cnpj}|{uf}|{programa}|{categoria}"
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+    return os.path.join(artifact_root(), f"v{version}", digest + ARTIFACT_EXTENSIONS[fmt])
+
+
+def evict_stale_artifacts(version: int) -> int:
+    """Remove the artifact directories of sync versions older than ``version``.
+
+    The version right before it is kept, so downloads that read the version
+    just before a sync can still finish serving their file. Newer versions
+    belong to a sync this caller has not seen and are never touched.
+    """
+    removed = 0
+    for stale_version, folder in version_dirs(artifact_root()).items():
+        if stale_version < version - 1:
+            shutil.rmtree(folder, ignore_errors=True)
+            removed += 1
+    if removed:
+        logger.info("Evicted %s stale pricing artifact versions", removed)
+    return removed
+
+
+def _temp_path(path: str) -> str:
+    # Written under a temporary name and renamed, so readers never see a
+    # partial file and concurrent writers just race to the same content.
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.tmp-{os.getpid()}-{threading.get_ident()}{ext}"
+
+
+def _csv_value(value):
+    return "" if value is None else value
+
+
+def iter_csv_chunks(rows: Iterable[dict], columns: list[str], chunk_size: int = CSV_CHUNK_BYTES) -> Iterator[str]:
+    """CSV text for ``rows`` in chunks of roughly ``chunk_size`` characters.
+
+    Matches ``DataFrame.to_csv(index=False)``: header row, minimal quoting,
+    empty cells for None.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator=os.linesep)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_csv_value(row.get(col)) for col in columns])
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_csv_artifact(path: str, rows: Iterable[dict], columns: list[str]) -> Iterator[bytes]:
+    """Yield a table's CSV bytes while saving the same bytes as its artifact.
+
+    Only ``CSV_CHUNK_BYTES`` are held at a time. The artifact is published
+    once the last chunk was written; an interrupted download discards it.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = _temp_path(path)
+    completed = False
+    try:
+        with open(tmp_path, "wb") as fh:
+            for chunk in iter_csv_chunks(rows, columns):
+                data = chunk.encode("utf-8")
+                fh.write(data)
+                yield data
+        os.replace(tmp_path, path)
+        completed = True
+    finally:
+        if not completed and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def compressed_artifact(path: str, encoding: str) -> str:
+    """Path to the ``encoding`` copy of an artifact, compressing it on first request.
+
+    The copy sits next to the artifact (``<digest>.csv.br``), so evicting a
+    version removes both.
+    """
+    target = path + ENCODING_SUFFIXES[encoding]
+    if os.path.exists(target):
+        return target
+    tmp_path = _temp_path(target)
+    try:
+        compress_file(path, tmp_path, encoding)
+        os.replace(tmp_path, target)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return target
+
+
+def _xlsx_header(ws, columns: list[str]) -> list[WriteOnlyCell]:
+    # Same look as the header pandas.to_excel writes.
+    side = Side(style="thin")
+    cells = []
+    for col in columns:
+        cell = WriteOnlyCell(ws, value=col)
+        cell.font = Font(bold=True)
+        cell.border = Border(top=side, right=side, bottom=side, left=side)
+        cell.alignment = Alignment(horizontal="center", vertical="top")
+        cells.append(cell)
+    return cells
+
+
+def write_artifact(path: str, rows: Iterable[dict], columns: list[str], fmt: str):
+    """Write a table artifact from a row iterator without holding the table in memory.
+
+    XLSX uses openpyxl's write-only mode, which streams rows to a temporary
+    sheet file instead of building a cell tree.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = _temp_path(path)
+    try:
+        if fmt == "csv":
+            with open(tmp_path, "w", encoding="utf-8", newline="") as fh:
+                for chunk in iter_csv_chunks(rows, columns):
+                    fh.write(chunk)
+        else:
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet("Tabela")
+            ws.append(_xlsx_header(ws, columns))
+            for row in rows:
+                ws.append([row.get(col) for col in columns])
+            wb.save(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def prepare_version_dir(version: int):
+    version_dir = os.path.join(artifact_root(), f"v{version}")
+    if not os.path.isdir(version_dir):
+        # First artifact of a new version on this volume: drop the older ones,
+        # which also covers workers that did not run the sync themselves.
+        os.makedirs(version_dir, exist_ok=True)
+        evict_stale_artifacts(version)
+
+
+def get_or_create_artifact(
+    version: int,
+    cnpj: str,
+    uf: str,
+    programa: str,
+    categoria: str,
+    fmt: str,
+    load_rows: Callable[[], Iterable[dict]],
+    columns: list[str],
+) -> str:
+    """Path to a table's download file, generating it on first request."""
+    path = artifact_path(version, cnpj, uf, programa, categoria, fmt)
+    if os.path.exists(path):
+        return path
+    prepare_version_dir(version)
+    write_artifact(path, load_rows(), columns, fmt)
+    return path
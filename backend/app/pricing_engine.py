@@ -0,0 +1,217 @@
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+MASTER_COLUMNS = ["uf", "cod_item", "den_item", "pre_unit", "aliq_ipi", "aliq_st"]
+PROGRAM_COLUMNS = [
+    "cod_item",
+    "desc_base",
+    "desc_redu",
+    "desc_prog",
+    "desc_camp",
+    "vald_camp",
+    "desc_seq",
+    "desc_factors",
+    "camp_seq",
+    "camp_factors",
+]
+CLIENT_COLUMNS = ["cod_item", "desc_cli", "desc_seq", "desc_factors"]
+UF_COLUMNS = ["cod_uf", "cod_item", "desc_uf", "desc_seq", "desc_factors"]
+
+
+def parse_discount_seq(raw) -> list[float]:
+    if raw is None:
+        return []
+    text = str(raw).strip()
+    if not text or text.lower() == "nan":
+        return []
+    parts = [p.strip() for p in text.replace("%", "").split("+") if p.strip()]
+    out = []
+    for part in parts:
+        try:
+            out.append(float(part.replace(",", ".")))
+        except Exception:
+            continue
+    return out
+
+
+def format_discount_seq(seq: list[float]) -> str:
+    return "+".join(str(int(x) if float(x).is_integer() else x) for x in seq)
+
+
+def campaign_valid(vald_camp) -> bool:
+    if vald_camp is None or str(vald_camp).strip() == "" or str(vald_camp).lower() == "nan":
+        return False
+    try:
+        camp_date = pd.to_datetime(vald_camp).date()
+        return camp_date >= datetime.utcnow().date()
+    except Exception:
+        return False
+
+
+@lru_cache(maxsize=8192)
+def discount_terms(*raws) -> tuple[str | None, str]:
+    """Normalized cascade string and per-step factors for raw discount cells.
+
+    Factors are stored as their exact float reprs separated by spaces ("" for
+    no discount), so applying them one at a time reproduces the per-item loop
+    bit for bit.
+    """
+    seq = []
+    for raw in raws:
+        seq += parse_discount_seq(raw)
+    factors = " ".join(repr(1 - (pct / 100.0)) for pct in seq)
+    return format_discount_seq(seq) or None, factors
+
+
+def fill_discount_terms(frame: pd.DataFrame, raw_columns: list[str], seq_col: str = "desc_seq", factors_col: str = "desc_factors") -> pd.DataFrame:
+    # Rows loaded before the factors were persisted (or read straight from
+    # the workbooks) only carry the raw strings; parse each distinct combination once.
+    frame = frame.copy()
+    frame[factors_col] = frame[factors_col].astype(object) if factors_col in frame.columns else None
+    frame[seq_col] = frame[seq_col].astype(object) if seq_col in frame.columns else None
+    missing = frame[factors_col].isna()
+    if not missing.any():
+        return frame
+    raws = frame.loc[missing, raw_columns].astype(object)
+    raws = raws.where(raws.notna(), None)
+    terms = [discount_terms(*values) for values in raws.itertuples(index=False, name=None)]
+    frame.loc[missing, seq_col] = pd.Series([t[0] for t in terms], index=raws.index, dtype=object)
+    frame.loc[missing, factors_col] = pd.Series([t[1] for t in terms], index=raws.index, dtype=object)
+    return frame
+
+
+def _campaign_mask(values: pd.Series) -> np.ndarray:
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    valid = np.array([campaign_valid(u) for u in uniques] + [False], dtype=bool)
+    return valid[codes]
+
+
+def _join_labels(blocks: list[np.ndarray], size: int) -> np.ndarray:
+    out = np.empty(size, dtype=object)
+    out[:] = ""
+    for labels in blocks:
+        empty_out = out == ""
+        empty_labels = labels == ""
+        out = np.where(empty_out, labels, np.where(empty_labels, out, out + "+" + labels))
+    return out
+
+
+def _labels(values: pd.Series) -> np.ndarray:
+    return values.astype(object).where(values.notna(), "").to_numpy(dtype=object)
+
+
+def _factor_matrix(values: pd.Series) -> np.ndarray:
+    # One row of factors per item, padded with 1.0 (an exact no-op) to the
+    # longest cascade. Each distinct factor string is split once; the extra
+    # trailing row is the neutral term used for NA codes (-1).
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    parsed = [[float(factor) for factor in str(text).split()] for text in uniques]
+    width = max((len(factors) for factors in parsed), default=0)
+    matrix = np.ones((len(parsed) + 1, width), dtype=float)
+    for i, factors in enumerate(parsed):
+        matrix[i, :len(factors)] = factors
+    return matrix[codes]
+
+
+def _align(frame: pd.DataFrame, keys: list[str], index) -> pd.DataFrame:
+    # Last row wins on duplicate keys, matching the dict-based lookups of the loop.
+    frame = frame.drop_duplicates(subset=keys, keep="last").set_index(keys)
+    return frame.reindex(index)
+
+
+def _numeric(values: pd.Series) -> np.ndarray:
+    return pd.to_numeric(values, errors="coerce").fillna(0.0).to_numpy(dtype=float)
+
+
+def compute_pricing_rows(
+    master: pd.DataFrame,
+    program: pd.DataFrame,
+    client: pd.DataFrame,
+    uf_discounts: pd.DataFrame,
+    programa: str,
+    categoria: str,
+) -> list[dict]:
+    """Price every master row in one pass.
+
+    ``master`` may hold one or several UFs; UF discounts are joined on
+    (uf, cod_item). Each discount row contributes its pre-parsed factors and
+    cascade string (see ``discount_terms``). Factors are applied one at a
+    time in the order of the original per-item loop (program, campaign,
+    client, UF), so results are bit-for-bit identical to it.
+    """
+    if master.empty:
+        return []
+    master = master.reset_index(drop=True)
+    item_index = pd.Index(master["cod_item"])
+    uf_index = pd.MultiIndex.from_arrays([master["uf"], master["cod_item"]])
+
+    program = fill_discount_terms(program.reindex(columns=PROGRAM_COLUMNS), ["desc_base", "desc_redu", "desc_prog"])
+    program = fill_discount_terms(program, ["desc_camp"], seq_col="camp_seq", factors_col="camp_factors")
+    client = fill_discount_terms(client.reindex(columns=CLIENT_COLUMNS), ["desc_cli"])
+    uf_discounts = fill_discount_terms(uf_discounts.reindex(columns=UF_COLUMNS), ["desc_uf"])
+
+    p = _align(program, ["cod_item"], item_index)
+    c = _align(client, ["cod_item"], item_index)
+    u = _align(uf_discounts, ["cod_uf", "cod_item"], uf_index)
+
+    camp_valid = _campaign_mask(p["vald_camp"])
+    factor_blocks = [
+        _factor_matrix(p["desc_factors"]),
+        np.where(camp_valid[:, None], _factor_matrix(p["camp_factors"]), 1.0),
+        _factor_matrix(c["desc_factors"]),
+        _factor_matrix(u["desc_factors"]),
+    ]
+    label_blocks = [
+        _labels(p["desc_seq"]),
+        np.where(camp_valid, _labels(p["camp_seq"]), ""),
+        _labels(c["desc_seq"]),
+        _labels(u["desc_seq"]),
+    ]
+
+    pre_unit = _numeric(master["pre_unit"])
+    price = pre_unit.copy()
+    for factors in factor_blocks:
+        for j in range(factors.shape[1]):
+            price = price * factors[:, j]
+
+    aliq_ipi = _numeric(master["aliq_ipi"])
+    aliq_st = _numeric(master["aliq_st"])
+    valor_ipi = price * (aliq_ipi / 100.0)
+    valor_st = price * (aliq_st / 100.0)
+    valor_final = price + valor_ipi + valor_st
+    cascata = _join_labels(label_blocks, len(master))
+
+    den_item = master["den_item"].astype(object).where(master["den_item"].notna(), None)
+    return [
+        {
+            "UF": row_uf,
+            "COD_ITEM": cod_item,
+            "DEN_ITEM": den,
+            "PRE_UNIT": round(pre, 2),
+            "DESCONTOS_CASCATA": seq,
+            "BASE_LIQUIDA": round(base, 2),
+            "ALIQ_IPI": ipi,
+            "ALIQ_ST": st,
+            "VALOR_IPI": round(v_ipi, 2),
+            "VALOR_ST": round(v_st, 2),
+            "VALOR_FINAL": round(final, 2),
+            "PROGRAMA": programa,
+            "CATEGORIA": categoria,
+        }
+        for row_uf, cod_item, den, pre, seq, base, ipi, st, v_ipi, v_st, final in zip(
+            master["uf"].tolist(),
+            master["cod_item"].tolist(),
+            den_item.tolist(),
+            pre_unit.tolist(),
+            cascata.tolist(),
+            price.tolist(),
+            aliq_ipi.tolist(),
+            aliq_st.tolist(),
+            valor_ipi.tolist(),
+            valor_st.tolist(),
+            valor_final.tolist(),
+        )
+    ]
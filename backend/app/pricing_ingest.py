@@ -0,0 +1,482 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from typing import Callable, Iterator
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from sqlalchemy import MetaData
+
+from app import models
+from app.core.config import settings
+from app.db import SessionLocal
+from app.pricing_engine import discount_terms
+
+logger = logging.getLogger(__name__)
+MASTER_REQUIRED_COLUMNS = ["UF", "COD_ITEM", "PRE_UNIT", "ALIQ_IPI", "ALIQ_ST", "IVA"]
+DISCOUNT_SHEETS = {
+    "program_discount": "PROG_DESC_ITEM",
+    "client_discount": "PROG_DESC_ITEM_CLI",
+    "uf_discount": "UF_ITEM",
+}
+SOURCE_MODELS = {
+    "master": models.PricingMasterItem,
+    "client_program": models.PricingClientProgram,
+    "program_discount": models.PricingProgramItemDiscount,
+    "client_discount": models.PricingClientItemDiscount,
+    "uf_discount": models.PricingUfItemDiscount,
+}
+
+
+class PricingSourceError(ValueError):
+    """A pricing source file is missing or malformed."""
+
+
+def normalize_cnpj(value: str) -> str:
+    return re.sub(r"\D", "", value or "")
+
+
+def to_float(value) -> float:
+    if value is None:
+        return 0.0
+    text = str(value).strip()
+    if not text or text.lower() == "nan":
+        return 0.0
+    text = text.replace("%", "").replace(" ", "")
+    text = text.replace(".", "").replace(",", ".") if text.count(",") == 1 and text.count(".") > 1 else text
+    try:
+        return float(text)
+    except Exception:
+        return 0.0
+
+
+def _cell_text(value) -> str:
+    # Same text pandas produces for read_excel(dtype=str): integral floats lose
+    # their ".0" and empty cells become "".
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        if value != value:
+            return ""
+        if value.is_integer():
+            return str(int(value))
+    return str(value).strip()
+
+
+def iter_sheet_rows(path: str, sheet_name: str | None = None) -> Iterator[dict]:
+    """Yield the rows of a worksheet as {header: text} dicts.
+
+    Uses openpyxl's read-only mode, which parses the sheet XML lazily, so only
+    the current row is held in memory. ``sheet_name=None`` reads the first sheet.
+    """
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [_cell_text(c) for c in header]
+        for values in rows:
+            if not any(v is not None for v in values):
+                continue
+            yield {col: _cell_text(v) for col, v in zip(columns, values) if col}
+    finally:
+        workbook.close()
+
+
+def iter_csv_rows(path: str, chunk_size: int) -> Iterator[dict]:
+    for chunk in pd.read_csv(path, sep="|", dtype=str, engine="python", on_bad_lines="skip", chunksize=chunk_size):
+        chunk.columns = [c.strip() for c in chunk.columns]
+        chunk = chunk.fillna("")
+        for record in chunk.to_dict(orient="records"):
+            yield {col: str(value).strip() for col, value in record.items()}
+
+
+def _text(row: dict, col: str) -> str:
+    return str(row.get(col, "") or "").strip()
+
+
+def normalize_master_row(row: dict) -> dict | None:
+    cod_item = _text(row, "COD_ITEM")
+    uf = _text(row, "UF").upper()
+    if not cod_item or not uf:
+        return None
+    return {
+        "uf": uf,
+        "num_list": _text(row, "NUM_LIST") or None,
+        "den_list": _text(row, "DEN_LIST") or None,
+        "cod_item": cod_item,
+        "den_item": _text(row, "DEN_ITEM") or None,
+        "um": _text(row, "UM") or None,
+        "cla_fisc": _text(row, "CLA_FISC") or None,
+        "pre_unit": to_float(row.get("PRE_UNIT")),
+        "aliq_ipi": to_float(row.get("ALIQ_IPI")),
+        "iva": to_float(row.get("IVA")),
+        "aliq_st": to_float(row.get("ALIQ_ST")),
+    }
+
+
+def normalize_client_program_row(row: dict) -> dict | None:
+    if "COD_EMPRESA" in row and not re.match(r"^\d+$", _text(row, "COD_EMPRESA")):
+        return None
+    cnpj = normalize_cnpj(row.get("COD_CLIENTE"))
+    programa = _text(row, "PROGRAMA").upper()
+    categoria = _text(row, "CATEGORIA").upper()
+    if not cnpj or not programa or not categoria:
+        return None
+    return {
+        "cod_empresa": _text(row, "COD_EMPRESA") or None,
+        "cod_cliente": cnpj,
+        "programa": programa,
+        "categoria": categoria,
+    }
+
+
+def _parse_vald_camp(value) -> datetime | None:
+    parsed = pd.to_datetime(value or None, errors="coerce")
+    return None if pd.isna(parsed) else parsed.to_pydatetime()
+
+
+def normalize_program_discount_row(row: dict) -> dict | None:
+    cod_item = _text(row, "COD_ITEM")
+    programa = _text(row, "PROGRAMA").upper()
+    categoria = _text(row, "CATEGORIA").upper()
+    if not cod_item or not programa or not categoria:
+        return None
+    desc_base = _text(row, "DESC_BASE") or None
+    desc_redu = _text(row, "DESC_REDU") or None
+    desc_prog = _text(row, "DESC_PROG") or None
+    desc_camp = _text(row, "DESC_CAMP") or None
+    desc_seq, desc_factors = discount_terms(desc_base, desc_redu, desc_prog)
+    camp_seq, camp_factors = discount_terms(desc_camp)
+    return {
+        "cod_empresa": _text(row, "COD_EMPRESA") or None,
+        "programa": programa,
+        "categoria": categoria,
+        "cod_item": cod_item,
+        "desc_base": desc_base,
+        "desc_redu": desc_redu,
+        "desc_prog": desc_prog,
+        "desc_camp": desc_camp,
+        "vald_camp": _parse_vald_camp(row.get("VALD_CAMP")),
+        "desc_seq": desc_seq,
+        "desc_factors": desc_factors,
+        "camp_seq": camp_seq,
+        "camp_factors": camp_factors,
+    }
+
+
+def normalize_client_discount_row(row: dict) -> dict | None:
+    cod_item = _text(row, "COD_ITEM")
+    cnpj = normalize_cnpj(row.get("COD_CLIENTE"))
+    if not cod_item or not cnpj:
+        return None
+    desc_cli = _text(row, "DESC_CLI") or None
+    desc_seq, desc_factors = discount_terms(desc_cli)
+    return {
+        "cod_empresa": _text(row, "COD_EMPRESA") or None,
+        "cod_cliente": cnpj,
+        "cod_item": cod_item,
+        "desc_cli": desc_cli,
+        "desc_seq": desc_seq,
+        "desc_factors": desc_factors,
+    }
+
+
+def normalize_uf_discount_row(row: dict) -> dict | None:
+    cod_item = _text(row, "COD_ITEM")
+    cod_uf = (_text(row, "COD_UF") or _text(row, "ESTADO")).upper()
+    if not cod_item or not cod_uf:
+        return None
+    desc_uf = _text(row, "DESC_UF") or None
+    desc_seq, desc_factors = discount_terms(desc_uf)
+    return {
+        "cod_empresa": _text(row, "COD_EMPRESA") or None,
+        "cod_uf": cod_uf,
+        "cod_item": cod_item,
+        "desc_uf": desc_uf,
+        "desc_seq": desc_seq,
+        "desc_factors": desc_factors,
+    }
+
+
+def _require_file(path: str, label: str):
+    if not os.path.exists(path):
+        raise PricingSourceError(f"{label} not found: {path}")
+
+
+def _iter_master_rows(path: str) -> Iterator[dict]:
+    _require_file(path, "Master workbook")
+    checked = False
+    for row in iter_sheet_rows(path):
+        if not checked:
+            for col in MASTER_REQUIRED_COLUMNS:
+                if col not in row:
+                    raise PricingSourceError(f"Missing column in master sheet: {col}")
+            checked = True
+        normalized = normalize_master_row(row)
+        if normalized:
+            yield normalized
+
+
+def _iter_client_program_rows(path: str, chunk_size: int) -> Iterator[dict]:
+    _require_file(path, "Client program file")
+    # Later lines override earlier ones for the same (cnpj, programa, categoria);
+    # the file is one row per client program, so this map stays small.
+    rows = {}
+    for row in iter_csv_rows(path, chunk_size):
+        normalized = normalize_client_program_row(row)
+        if normalized:
+            rows[(normalized["cod_cliente"], normalized["programa"], normalized["categoria"])] = normalized
+    yield from rows.values()
+
+
+def _iter_discount_rows(name: str, path: str) -> Iterator[dict]:
+    _require_file(path, "Discount workbook")
+    normalize = {
+        "program_discount": normalize_program_discount_row,
+        "client_discount": normalize_client_discount_row,
+        "uf_discount": normalize_uf_discount_row,
+    }[name]
+    for row in iter_sheet_rows(path, DISCOUNT_SHEETS[name]):
+        normalized = normalize(row)
+        if normalized:
+            yield normalized
+
+
+def source_path(name: str) -> str:
+    if name == "master":
+        return settings.pricing_master_path
+    if name == "client_program":
+        return settings.pricing_client_program_path
+    return settings.pricing_discounts_path
+
+
+def iter_source_rows(name: str, path: str | None = None, chunk_size: int = 2000) -> Iterator[dict]:
+    """Normalized rows for one pricing source table, streamed from its file."""
+    path = path or source_path(name)
+    if name == "master":
+        return _iter_master_rows(path)
+    if name == "client_program":
+        return _iter_client_program_rows(path, chunk_size)
+    return _iter_discount_rows(name, path)
+
+
+def iter_source_chunks(name: str, path: str | None = None, chunk_size: int = 2000) -> Iterator[list[dict]]:
+    chunk = []
+    for row in iter_source_rows(name, path, chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def read_source_rows(name: str, path: str) -> list[dict]:
+    return list(iter_source_rows(name, path))
+
+
+def load_source_to_table(name: str, path: str, table_name: str, chunk_size: int = 2000) -> int:
+    """Stream one source into ``table_name`` (a copy of its model's table) and return the row count.
+
+    Runs in a worker process during full syncs, so it opens its own session.
+    """
+    table = SOURCE_MODELS[name].__table__.to_metadata(MetaData(), name=table_name)
+    db = SessionLocal()
+    try:
+        count = 0
+        for chunk in iter_source_chunks(name, path, chunk_size):
+            db.execute(table.insert(), chunk)
+            db.commit()
+            count += len(chunk)
+        return count
+    finally:
+        db.close()
+
+
+def read_master_frame(path: str) -> pd.DataFrame:
+    _require_file(path, "Master workbook")
+    df = pd.read_excel(path, dtype=str)
+    df.columns = [c.strip() for c in df.columns]
+    for col in MASTER_REQUIRED_COLUMNS:
+        if col not in df.columns:
+            raise PricingSourceError(f"Missing column in master sheet: {col}")
+    return df
+
+
+def read_discount_frame(path: str, sheet_name: str) -> pd.DataFrame:
+    _require_file(path, "Discount workbook")
+    df = pd.read_excel(path, sheet_name=sheet_name, dtype=str)
+    df.columns = [c.strip() for c in df.columns]
+    for c in df.columns:
+        df[c] = df[c].astype(str).str.strip()
+    if "ESTADO" in df.columns and "COD_UF" not in df.columns:
+        df = df.rename(columns={"ESTADO": "COD_UF"})
+    return df
+
+
+def read_client_program_frame(path: str) -> pd.DataFrame:
+    _require_file(path, "Client program file")
+    df = pd.read_csv(path, sep="|", dtype=str, engine="python", on_bad_lines="skip")
+    df.columns = [c.strip() for c in df.columns]
+    for col in ["COD_EMPRESA", "COD_CLIENTE", "PROGRAMA", "CATEGORIA"]:
+        if col in df.columns:
+            df[col] = df[col].astype(str).str.strip()
+    if "COD_EMPRESA" in df.columns:
+        df = df[df["COD_EMPRESA"].str.contains(r"^\d+$", na=False)]
+    return df
+
+
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    # Spawned (not forked) workers: the web process runs threads and holds DB
+    # connections, neither of which survive a fork safely. The pool is kept
+    # alive so later syncs and file fallbacks skip the interpreter start-up.
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.pricing_parse_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def run_source_tasks(tasks: list[tuple], on_result: Callable[[int, object], None] | None = None) -> list:
+    """Run (fn, args) parsing tasks concurrently, one per sheet, in a process pool.
+
+    Excel parsing is CPU-bound, so threads would serialize on the GIL. With
+    PRICING_PARSE_WORKERS <= 1 the tasks run in order in this process.
+    ``on_result(index, result)`` is called as each task finishes.
+    """
+    results = [None] * len(tasks)
+    if settings.pricing_parse_workers <= 1 or len(tasks) <= 1:
+        for index, (fn, args) in enumerate(tasks):
+            results[index] = fn(*args)
+            if on_result:
+                on_result(index, results[index])
+        return results
+    executor = _get_executor()
+    futures = {executor.submit(fn, *args): index for index, (fn, args) in enumerate(tasks)}
+    for future in as_completed(futures):
+        index = futures[future]
+        results[index] = future.result()
+        if on_result:
+            on_result(index, results[index])
+    return results
+
+
+_frame_cache: dict[tuple[str, str], tuple[tuple[int, int], pd.DataFrame]] = {}
+_frame_cache_lock = threading.Lock()
+
+
+def _source_stamp(path: str) -> tuple[int, int] | None:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _sidecar_prefix(path: str, part: str) -> str:
+    return f".{os.path.basename(path)}.{part}."
+
+
+def _sidecar_path(path: str, part: str, stamp: tuple[int, int]) -> str:
+    folder = settings.pricing_source_cache_dir or os.path.dirname(os.path.abspath(path))
+    return os.path.join(folder, f"{_sidecar_prefix(path, part)}{stamp[0]}-{stamp[1]}.parquet")
+
+
+def _read_sidecar(sidecar: str) -> pd.DataFrame | None:
+    if not os.path.exists(sidecar):
+        return None
+    try:
+        frame = pd.read_parquet(sidecar)
+    except Exception as exc:
+        logger.warning("Ignoring unreadable pricing source cache %s: %s", sidecar, exc)
+        return None
+    # Parquet brings empty cells back as None; the parsers leave NaN there.
+    return frame.astype(object).where(frame.notna(), np.nan)
+
+
+def _write_sidecar(sidecar: str, prefix: str, frame: pd.DataFrame):
+    folder, name = os.path.split(sidecar)
+    tmp_path = f"{sidecar}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        os.makedirs(folder, exist_ok=True)
+        frame.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, sidecar)
+    except Exception as exc:
+        logger.warning("Could not write pricing source cache %s: %s", sidecar, exc)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+    # Sidecars of older versions of the same file are dead weight.
+    for entry in os.listdir(folder):
+        if entry.startswith(prefix) and entry.endswith(".parquet") and entry != name:
+            try:
+                os.remove(os.path.join(folder, entry))
+            except OSError:
+                pass
+
+
+def _cached_source_frame(path: str, part: str) -> tuple[tuple[int, int] | None, pd.DataFrame | None]:
+    """(stamp, frame) of one parsed source; the frame is None when the file must be parsed again."""
+    stamp = _source_stamp(path)
+    if stamp is None:
+        return None, None
+    key = (os.path.abspath(path), part)
+    cached = _frame_cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return stamp, cached[1]
+    frame = _read_sidecar(_sidecar_path(path, part, stamp))
+    if frame is not None:
+        with _frame_cache_lock:
+            _frame_cache[key] = (stamp, frame)
+    return stamp, frame
+
+
+def _store_source_frame(path: str, part: str, stamp: tuple[int, int], frame: pd.DataFrame):
+    with _frame_cache_lock:
+        _frame_cache[(os.path.abspath(path), part)] = (stamp, frame)
+    _write_sidecar(_sidecar_path(path, part, stamp), _sidecar_prefix(path, part), frame)
+
+
+def read_source_frames() -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """(master, program discounts, client discounts, UF discounts, client programs) as text frames.
+
+    Parsed frames are cached per (path, mtime, size), in memory and as a
+    Parquet sidecar next to the source (or in PRICING_SOURCE_CACHE_DIR), so
+    only files changed since the last read are parsed again. The returned
+    frames are shared and must not be modified.
+    """
+    discounts_path = settings.pricing_discounts_path
+    sources = [
+        (read_master_frame, (settings.pricing_master_path,), "master"),
+        (read_discount_frame, (discounts_path, DISCOUNT_SHEETS["program_discount"]), DISCOUNT_SHEETS["program_discount"]),
+        (read_discount_frame, (discounts_path, DISCOUNT_SHEETS["client_discount"]), DISCOUNT_SHEETS["client_discount"]),
+        (read_discount_frame, (discounts_path, DISCOUNT_SHEETS["uf_discount"]), DISCOUNT_SHEETS["uf_discount"]),
+        (read_client_program_frame, (settings.pricing_client_program_path,), "client_program"),
+    ]
+    frames = [None] * len(sources)
+    stamps = [None] * len(sources)
+    for index, (_, args, part) in enumerate(sources):
+        # Stamped before parsing, so a file replaced mid-read is parsed again next time.
+        stamps[index], frames[index] = _cached_source_frame(args[0], part)
+    pending = [index for index, frame in enumerate(frames) if frame is None]
+    results = run_source_tasks([sources[index][:2] for index in pending])
+    for index, frame in zip(pending, results):
+        if stamps[index] is not None:
+            _store_source_frame(sources[index][1][0], sources[index][2], stamps[index], frame)
+        frames[index] = frame
+    return tuple(frames)
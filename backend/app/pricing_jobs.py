@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+import json
+import logging
+import time
+
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.config import settings
+from app.db import SessionLocal
+from app.pricing_snapshot import lock_sync_state
+
+logger = logging.getLogger(__name__)
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def active_sync_job(db: Session) -> models.PricingSyncJob | None:
+    """The queued or running sync job, if any.
+
+    A job whose progress has not been written for PRICING_SYNC_JOB_TIMEOUT_MINUTES
+    is assumed to have died with its worker and is marked failed, so a crash
+    never blocks later syncs.
+    """
+    stale_before = datetime.utcnow() - timedelta(minutes=settings.pricing_sync_job_timeout_minutes)
+    jobs = (
+        db.query(models.PricingSyncJob)
+        .filter(models.PricingSyncJob.status.in_(ACTIVE_STATUSES))
+        .order_by(models.PricingSyncJob.id.asc())
+        .all()
+    )
+    active = None
+    for job in jobs:
+        if job.updated_at < stale_before:
+            job.status = "failed"
+            job.error = "Sync job stopped reporting progress"
+            job.finished_at = datetime.utcnow()
+        elif active is None:
+            active = job
+    return active
+
+
+def create_sync_job(db: Session, mode: str, requested_by: int | None) -> tuple[models.PricingSyncJob, bool]:
+    """Queue a sync job unless one is already active; returns (job, created).
+
+    The sync state row lock makes the check-and-insert atomic across workers;
+    the caller must commit to release it.
+    """
+    lock_sync_state(db)
+    existing = active_sync_job(db)
+    if existing is not None:
+        return existing, False
+    now = datetime.utcnow()
+    job = models.PricingSyncJob(
+        mode=mode,
+        status="queued",
+        rows_processed=0,
+        requested_by=requested_by,
+        created_at=now,
+        updated_at=now,
+    )
+    db.add(job)
+    db.flush()
+    return job, True
+
+
+def sync_job_status(job: models.PricingSyncJob) -> dict:
+    end = job.finished_at or datetime.utcnow()
+    start = job.started_at or job.created_at
+    return {
+        "job_id": job.id,
+        "mode": job.mode,
+        "status": job.status,
+        "phase": job.phase,
+        "rows_processed": job.rows_processed or 0,
+        "elapsed_seconds": round(max((end - start).total_seconds(), 0.0), 1),
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "error": job.error,
+        "result": json.loads(job.result) if job.result else None,
+    }
+
+
+class SyncJobProgress:
+    """Writes a running sync's phase and row counter to its job row.
+
+    Updates go through their own session so they are visible while the sync
+    transaction is still open, and row counts are flushed at most every
+    ``interval`` seconds. ``rows_processed`` counts rows of the current phase.
+    """
+
+    def __init__(self, job_id: int, interval: float = 2.0):
+        self.job_id = job_id
+        self.interval = interval
+        self.phase_name = None
+        self.rows = 0
+        self._written_at = 0.0
+
+    def _write(self, **fields):
+        db = SessionLocal()
+        try:
+            db.query(models.PricingSyncJob).filter(models.PricingSyncJob.id == self.job_id).update(
+                {**fields, "updated_at": datetime.utcnow()},
+                synchronize_session=False,
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("Could not update pricing sync job %s", self.job_id)
+        finally:
+            db.close()
+        self._written_at = time.monotonic()
+
+    def start(self):
+        self._write(status="running", started_at=datetime.utcnow())
+
+    def phase(self, name: str):
+        self.phase_name = name
+        self.rows = 0
+        self._write(phase=name, rows_processed=0)
+
+    def add_rows(self, count: int):
+        self.rows += count
+        if time.monotonic() - self._written_at >= self.interval:
+            self._write(rows_processed=self.rows)
+
+    def finish(self, result: dict):
+        self._write(
+            status="succeeded",
+            rows_processed=self.rows,
+            result=json.dumps(result, default=str),
+            finished_at=datetime.utcnow(),
+        )
+
+    def fail(self, error: str):
+        self._write(status="failed", rows_processed=self.rows, error=error[:500], finished_at=datetime.utcnow())
@@ -0,0 +1,64 @@
+from contextlib import contextmanager
+import hashlib
+import logging
+import threading
+from typing import Iterator
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_local_locks: dict[str, list] = {}
+_local_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _local_lock(name: str) -> Iterator[None]:
+    with _local_locks_guard:
+        entry = _local_locks.setdefault(name, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _local_locks_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del _local_locks[name]
+
+
+@contextmanager
+def _advisory_lock(db: Session, name: str, timeout: int) -> Iterator[None]:
+    engine = db.get_bind()
+    if engine.dialect.name != "mysql":
+        yield
+        return
+    # MySQL lock names are limited to 64 characters.
+    lock_name = "pricing:" + hashlib.sha1(name.encode("utf-8")).hexdigest()
+    # GET_LOCK belongs to the connection, so it gets its own: the caller's
+    # session commits inside the block and would hand its connection back
+    # to the pool with the lock still held.
+    with engine.connect() as conn:
+        acquired = conn.execute(text("SELECT GET_LOCK(:name, :timeout)"), {"name": lock_name, "timeout": timeout}).scalar()
+        if acquired != 1:
+            logger.warning("Timed out waiting for pricing lock %s; computing without it", name)
+        try:
+            yield
+        finally:
+            if acquired == 1:
+                conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": lock_name})
+
+
+@contextmanager
+def single_flight(db: Session, name: str) -> Iterator[None]:
+    """Run the block for ``name`` in one thread of one worker at a time.
+
+    Threads of this process queue on a per-name lock; workers coordinate
+    through a MySQL advisory lock. Callers re-check whether the work is still
+    needed once inside, since whoever held the lock has usually done it.
+    """
+    with _local_lock(name), _advisory_lock(db, name, settings.pricing_compute_lock_timeout_seconds):
+        yield
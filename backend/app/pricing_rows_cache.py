@@ -0,0 +1,88 @@
+from collections import OrderedDict
+import sys
+import threading
+import time
+from typing import Callable
+
+from app.core.config import settings
+
+
+def estimate_rows_bytes(rows: list[dict]) -> int:
+    """Rough memory footprint of a row list, extrapolated from its first row."""
+    if not rows:
+        return sys.getsizeof(rows)
+    sample = rows[0]
+    per_row = sys.getsizeof(sample) + sum(sys.getsizeof(value) for value in sample.values())
+    return sys.getsizeof(rows) + per_row * len(rows)
+
+
+class RowsCache:
+    """Process-local LRU of finished pricing row lists, bounded by size and age.
+
+    Entries belong to one sync version. The first request that reads a newer
+    version drops them all, so each worker invalidates on its own after a
+    sync without any cross-process messaging. Requests still on an older
+    version neither read nor store. Cached lists are shared: callers must not
+    modify them. ``measure`` sizes an entry; the default fits row lists.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float, measure: Callable = estimate_rows_bytes):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.measure = measure
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _check_version(self, version: int) -> bool:
+        if self._version is not None and version < self._version:
+            return False
+        if version != self._version:
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+        return True
+
+    def get(self, key: tuple, version: int):
+        with self._lock:
+            if not self._check_version(version):
+                return None
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            rows, size, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._bytes -= size
+                return None
+            self._entries.move_to_end(key)
+            return rows
+
+    def put(self, key: tuple, version: int, rows):
+        size = self.measure(rows)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if not self._check_version(version):
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (rows, size, time.monotonic() + self.ttl_seconds)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+
+rows_cache = RowsCache(
+    max_bytes=settings.pricing_rows_cache_mb * 1024 * 1024,
+    ttl_seconds=settings.pricing_rows_cache_ttl_seconds,
+)
+# Compressed response bodies of whole tables, keyed like rows_cache plus format and encoding.
+body_cache = RowsCache(
+    max_bytes=settings.response_compression_cache_mb * 1024 * 1024,
+    ttl_seconds=settings.pricing_rows_cache_ttl_seconds,
+    measure=len,
+)
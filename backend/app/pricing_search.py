@@ -0,0 +1,148 @@
+import hashlib
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+GRAM_SIZES = (1, 2, 3)
+CODEPOINT_BITS = 21
+_COMBINING_MARKS = re.compile("[\u0300-\u036f]")
+
+
+def fold_text(value) -> str:
+    """Lowercase and strip accents so "AÇÃO" and "acao" compare equal."""
+    if value is None:
+        return ""
+    text = str(value)
+    if text.isascii():
+        return text.lower()
+    return _COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", text)).casefold()
+
+
+def _gram_key(gram: str) -> int:
+    key = 0
+    for char in gram:
+        key = (key << CODEPOINT_BITS) | ord(char)
+    return key
+
+
+class _Postings:
+    """n-gram -> sorted item ids, packed as one id array plus per-gram offsets.
+
+    Grams are encoded as integers (21 bits per code point), so the whole
+    table is built with numpy instead of a Python dict of lists. Texts are
+    encoded ``CHUNK_TEXTS`` at a time, each chunk padded only to its own
+    longest text, which bounds the intermediate matrices.
+    """
+
+    CHUNK_TEXTS = 2048
+
+    def __init__(self, texts: list[str]):
+        self.texts = texts
+        self.keys = {}
+        self.offsets = {}
+        self.ids = {}
+        grams = {size: ([], []) for size in GRAM_SIZES}
+        for start in range(0, len(texts), self.CHUNK_TEXTS):
+            chunk = texts[start:start + self.CHUNK_TEXTS]
+            for size, (keys, ids) in self._chunk_grams(chunk, start).items():
+                grams[size][0].append(keys)
+                grams[size][1].append(ids)
+        for size, (keys, ids) in grams.items():
+            # Chunks are in item order, so ids stay item-major across them.
+            self._pack(
+                size,
+                np.concatenate(keys) if keys else np.zeros(0, dtype=np.uint64),
+                np.concatenate(ids) if ids else np.zeros(0, dtype=np.int32),
+            )
+
+    @staticmethod
+    def _chunk_grams(texts: list[str], first_id: int) -> dict[int, tuple[np.ndarray, np.ndarray]]:
+        width = max([len(t) for t in texts] + [1])
+        encoded = np.array(texts, dtype=f"<U{width}").view(np.uint32).reshape(len(texts), width).astype(np.uint64)
+        lengths = np.array([len(t) for t in texts], dtype=np.int64)
+        item_ids = np.arange(first_id, first_id + len(texts), dtype=np.int32)
+        out = {}
+        for size in GRAM_SIZES:
+            windows = max(width - size + 1, 0)
+            # (item, start) matrix of gram keys, raveled item-major so that a
+            # stable sort by key leaves each gram's ids ascending.
+            keys = np.zeros((len(texts), windows), dtype=np.uint64)
+            for offset in range(size):
+                keys = (keys << np.uint64(CODEPOINT_BITS)) | encoded[:, offset:offset + windows]
+            valid = np.arange(windows)[None, :] + size <= lengths[:, None]
+            ids = np.broadcast_to(item_ids[:, None], keys.shape)
+            out[size] = (keys[valid], ids[valid])
+        return out
+
+    def _pack(self, size: int, keys: np.ndarray, ids: np.ndarray):
+        order = np.argsort(keys, kind="stable")
+        keys, ids = keys[order], ids[order]
+        # A gram repeated inside one text would list the item twice.
+        keep = np.ones(len(keys), dtype=bool)
+        keep[1:] = (keys[1:] != keys[:-1]) | (ids[1:] != ids[:-1])
+        keys, ids = keys[keep], ids[keep]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        self.keys[size] = keys[starts]
+        self.offsets[size] = np.append(starts, len(keys))
+        self.ids[size] = ids
+
+    def lookup(self, gram: str) -> np.ndarray:
+        size = len(gram)
+        keys = self.keys[size]
+        key = np.uint64(_gram_key(gram))
+        pos = int(np.searchsorted(keys, key))
+        if pos >= len(keys) or keys[pos] != key:
+            return self.ids[size][:0]
+        return self.ids[size][self.offsets[size][pos]:self.offsets[size][pos + 1]]
+
+    def search(self, query: str) -> np.ndarray:
+        if len(query) <= GRAM_SIZES[-1]:
+            return self.lookup(query)
+        size = GRAM_SIZES[-1]
+        lists = [self.lookup(query[i:i + size]) for i in range(len(query) - size + 1)]
+        lists.sort(key=len)
+        candidates = lists[0]
+        for ids in lists[1:]:
+            if not len(candidates):
+                return candidates
+            candidates = np.intersect1d(candidates, ids, assume_unique=True)
+        texts = self.texts
+        return np.array([i for i in candidates.tolist() if query in texts[i]], dtype=np.int32)
+
+
+class ItemSearchIndex:
+    """Substring index over one catalog's item codes and accent-folded descriptions.
+
+    Queries of up to three characters are a single postings lookup; longer
+    ones intersect their trigram postings (rarest first) and verify the
+    survivors with ``in``, so lookups never scan the catalog.
+    """
+
+    FIELDS = ("COD_ITEM", "DEN_ITEM")
+
+    def __init__(self, master: pd.DataFrame):
+        items = master.drop_duplicates(subset=["cod_item"], keep="last").sort_values("cod_item")
+        self.cod_items = np.array(items["cod_item"].astype(str).tolist(), dtype=object)
+        self._postings = {
+            "COD_ITEM": _Postings([fold_text(v) for v in items["cod_item"].tolist()]),
+            "DEN_ITEM": _Postings([fold_text(v) for v in items["den_item"].tolist()]),
+        }
+
+    @staticmethod
+    def catalog_key(master: pd.DataFrame) -> str:
+        """Digest of the (cod_item, den_item) pairs; UFs with the same catalog share one index."""
+        hashed = pd.util.hash_pandas_object(master[["cod_item", "den_item"]], index=False)
+        return hashlib.sha1(np.sort(hashed.to_numpy()).tobytes()).hexdigest()
+
+    def search(self, query: str, field: str | None = None) -> list[str]:
+        """COD_ITEMs (ascending) whose code or description contains ``query``."""
+        # Not stripped: like the SQL LIKE path, spaces are part of the substring.
+        query = fold_text(query)
+        if not query:
+            return self.cod_items.tolist()
+        fields = [field] if field else self.FIELDS
+        matches = [self._postings[f].search(query) for f in fields]
+        ids = matches[0] if len(matches) == 1 else np.union1d(*matches)
+        return self.cod_items[ids].tolist()
@@ -0,0 +1,306 @@
+from datetime import datetime
+import logging
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.config import settings
+from app.pricing_engine import CLIENT_COLUMNS, MASTER_COLUMNS, PROGRAM_COLUMNS, UF_COLUMNS, fill_discount_terms
+from app.pricing_search import ItemSearchIndex
+from app.versioned_dirs import version_dirs
+
+logger = logging.getLogger(__name__)
+SYNC_STATE_ID = 1
+SNAPSHOT_FRAMES = ("master", "program", "client", "uf_discounts")
+SNAPSHOT_COLUMNS = {
+    "master": MASTER_COLUMNS,
+    "program": ["programa", "categoria"] + PROGRAM_COLUMNS,
+    "client": ["cod_cliente"] + CLIENT_COLUMNS,
+    "uf_discounts": UF_COLUMNS,
+}
+# Files are sorted by these keys, so every group the snapshot serves is a contiguous slice.
+SNAPSHOT_GROUP_KEYS = {
+    "master": ["uf"],
+    "program": ["programa", "categoria"],
+    "client": ["cod_cliente"],
+    "uf_discounts": ["cod_uf"],
+}
+MASTER_NUMERIC_COLUMNS = ["pre_unit", "aliq_ipi", "aliq_st"]
+
+
+def query_frame(db: Session, model_cls, columns: list[str], *criteria) -> pd.DataFrame:
+    attrs = [getattr(model_cls, name) for name in columns]
+    rows = db.query(*attrs).filter(*criteria).all()
+    return pd.DataFrame([tuple(r) for r in rows], columns=columns)
+
+
+def current_version(db: Session) -> int:
+    version = db.query(models.PricingSyncState.version).filter(models.PricingSyncState.id == SYNC_STATE_ID).scalar()
+    return int(version or 0)
+
+
+def current_sync_state(db: Session) -> tuple[int, datetime | None]:
+    """(version, updated_at) of the last published sync."""
+    row = (
+        db.query(models.PricingSyncState.version, models.PricingSyncState.updated_at)
+        .filter(models.PricingSyncState.id == SYNC_STATE_ID)
+        .first()
+    )
+    if row is None:
+        return 0, None
+    return int(row[0] or 0), row[1]
+
+
+def lock_sync_state(db: Session) -> models.PricingSyncState:
+    """Row-lock the sync state until the caller commits; serializes syncs across workers."""
+    state = (
+        db.query(models.PricingSyncState)
+        .filter(models.PricingSyncState.id == SYNC_STATE_ID)
+        .with_for_update()
+        .first()
+    )
+    if state is None:
+        state = models.PricingSyncState(id=SYNC_STATE_ID, version=0)
+        db.add(state)
+        db.flush()
+    return state
+
+
+def bump_version(db: Session) -> int:
+    state = lock_sync_state(db)
+    state.version = (state.version or 0) + 1
+    state.updated_at = datetime.utcnow()
+    db.flush()
+    return state.version
+
+
+def _snapshot_dir(version: int) -> str:
+    return os.path.join(settings.pricing_snapshot_dir, f"v{version}")
+
+
+def read_snapshot_files(version: int) -> dict[str, pd.DataFrame] | None:
+    """Source frames of one sync version from its Arrow IPC files, or None if they were not written yet.
+
+    Frames are backed by the memory-mapped Arrow buffers (``pd.ArrowDtype``
+    columns), not converted into the worker's own memory: every worker that
+    loads a version reads the same page-cache pages, and the per-key groups
+    built from them are slices of those buffers.
+    """
+    if not settings.pricing_snapshot_dir or version <= 0:
+        return None
+    folder = _snapshot_dir(version)
+    if not os.path.isdir(folder):
+        return None
+    frames = {}
+    for name in SNAPSHOT_FRAMES:
+        with pa.memory_map(os.path.join(folder, f"{name}.arrow"), "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+        if table.schema.names != SNAPSHOT_COLUMNS[name] or (
+            name == "master" and not all(pa.types.is_floating(table.schema.field(c).type) for c in MASTER_NUMERIC_COLUMNS)
+        ):
+            # Written by a release with another column layout: rebuild it.
+            logger.info("Discarding pricing snapshot files for version %s with an outdated layout", version)
+            shutil.rmtree(folder, ignore_errors=True)
+            return None
+        frames[name] = table.to_pandas(types_mapper=pd.ArrowDtype)
+    return frames
+
+
+def write_snapshot_files(version: int, frames: dict[str, pd.DataFrame]):
+    """Publish a version's source frames as uncompressed Arrow IPC files and drop older versions.
+
+    Written to a temporary directory and renamed, so readers see all files
+    or none; when several workers race, the first rename wins.
+    """
+    if not settings.pricing_snapshot_dir or version <= 0:
+        return
+    folder = _snapshot_dir(version)
+    if os.path.isdir(folder):
+        return
+    tmp_folder = f"{folder}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        os.makedirs(tmp_folder, exist_ok=True)
+        for name in SNAPSHOT_FRAMES:
+            frame = frames[name].sort_values(SNAPSHOT_GROUP_KEYS[name], kind="stable")
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            with pa.OSFile(os.path.join(tmp_folder, f"{name}.arrow"), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        os.rename(tmp_folder, folder)
+    except Exception as exc:
+        if not os.path.isdir(folder):
+            logger.warning("Could not write pricing snapshot files for version %s: %s", version, exc)
+        return
+    finally:
+        shutil.rmtree(tmp_folder, ignore_errors=True)
+
+    # Workers that mapped an evicted version keep reading it; unlinking does
+    # not invalidate existing mappings.
+    for published, stale_folder in version_dirs(settings.pricing_snapshot_dir).items():
+        if published < version:
+            shutil.rmtree(stale_folder, ignore_errors=True)
+
+
+def _group(frame: pd.DataFrame, keys: list[str], columns: list[str]) -> dict:
+    """Rows of ``frame`` by ``keys``, in their original order within each group.
+
+    Groups are positional slices of the key-sorted frame; on Arrow-backed
+    frames those share the mapped buffers instead of copying them.
+    """
+    if frame.empty:
+        return {}
+    groups = frame.groupby(keys, sort=False).ngroup().to_numpy()
+    order = np.argsort(groups, kind="stable")
+    if (np.diff(order) != 1).any():
+        # Frames read from the files are already contiguous; only queried ones get reordered.
+        frame = frame.take(order)
+        groups = groups[order]
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]]).tolist() + [len(frame)]
+    out = {}
+    for start, stop in zip(starts, starts[1:]):
+        group = frame.iloc[start:stop]
+        out[tuple(group[keys].iloc[0].tolist())] = group[columns].reset_index(drop=True)
+    return out
+
+
+class PricingSnapshot:
+    """Read-only copy of the pricing source tables for one sync version.
+
+    Frames are grouped the way the pricing computation reads them: master and
+    UF discounts by UF, program discounts by (programa, categoria) and client
+    discounts by cnpj, so a request only slices dicts instead of querying MySQL.
+    """
+
+    def __init__(self, version: int, master: dict, program: dict, client: dict, uf_discounts: dict):
+        self.version = version
+        self._master = master
+        self._program = program
+        self._client = client
+        self._uf_discounts = uf_discounts
+        self._empty_program = pd.DataFrame(columns=PROGRAM_COLUMNS)
+        self._empty_client = pd.DataFrame(columns=CLIENT_COLUMNS)
+        self._empty_uf = pd.DataFrame(columns=UF_COLUMNS)
+        self._search_indexes = {}
+        self._search_catalogs = {}
+        self._search_lock = threading.Lock()
+
+    @staticmethod
+    def query_frames(db: Session) -> dict[str, pd.DataFrame]:
+        master = query_frame(db, models.PricingMasterItem, MASTER_COLUMNS)
+        program = query_frame(db, models.PricingProgramItemDiscount, ["programa", "categoria"] + PROGRAM_COLUMNS)
+        client = query_frame(db, models.PricingClientItemDiscount, ["cod_cliente"] + CLIENT_COLUMNS)
+        uf_discounts = query_frame(db, models.PricingUfItemDiscount, UF_COLUMNS)
+        # DECIMAL columns arrive as Decimal objects; store the floats the engine prices with.
+        master[MASTER_NUMERIC_COLUMNS] = master[MASTER_NUMERIC_COLUMNS].apply(pd.to_numeric, errors="coerce")
+        program = fill_discount_terms(program, ["desc_base", "desc_redu", "desc_prog"])
+        program = fill_discount_terms(program, ["desc_camp"], seq_col="camp_seq", factors_col="camp_factors")
+        client = fill_discount_terms(client, ["desc_cli"])
+        uf_discounts = fill_discount_terms(uf_discounts, ["desc_uf"])
+        return {"master": master, "program": program, "client": client, "uf_discounts": uf_discounts}
+
+    @classmethod
+    def load(cls, db: Session, version: int) -> "PricingSnapshot":
+        """Snapshot from the version's Arrow files, querying MySQL (and writing the files) only when they are missing."""
+        frames = None
+        try:
+            frames = read_snapshot_files(version)
+        except Exception:
+            logger.exception("Could not read pricing snapshot files for version %s", version)
+        if frames is None:
+            frames = cls.query_frames(db)
+            write_snapshot_files(version, frames)
+            # Map the files just written, so this worker shares them too.
+            frames = read_snapshot_files(version) or frames
+        master, program, client, uf_discounts = (frames[name] for name in SNAPSHOT_FRAMES)
+        return cls(
+            version=version,
+            master={uf: frame for (uf,), frame in _group(master, ["uf"], MASTER_COLUMNS).items()},
+            program=_group(program, ["programa", "categoria"], PROGRAM_COLUMNS),
+            client={cnpj: frame for (cnpj,), frame in _group(client, ["cod_cliente"], CLIENT_COLUMNS).items()},
+            uf_discounts={uf: frame for (uf,), frame in _group(uf_discounts, ["cod_uf"], UF_COLUMNS).items()},
+        )
+
+    def ufs(self) -> list[str]:
+        return sorted(self._master)
+
+    def master(self, uf: str) -> pd.DataFrame | None:
+        return self._master.get(uf)
+
+    def search_index(self, uf: str) -> ItemSearchIndex | None:
+        """Item search index for one UF, built on first use and shared by all its clients.
+
+        UFs usually list the same items at different prices, so indexes are
+        keyed by catalog content and reused across UFs.
+        """
+        index = self._search_indexes.get(uf)
+        if index is not None:
+            return index
+        master = self._master.get(uf)
+        if master is None:
+            return None
+        with self._search_lock:
+            index = self._search_indexes.get(uf)
+            if index is None:
+                key = ItemSearchIndex.catalog_key(master)
+                index = self._search_catalogs.get(key)
+                if index is None:
+                    index = ItemSearchIndex(master)
+                    self._search_catalogs[key] = index
+                self._search_indexes[uf] = index
+            return index
+
+    def program(self, programa: str, categoria: str, fallback: str | None = None) -> pd.DataFrame:
+        frame = self._program.get((programa, categoria))
+        if frame is None and fallback:
+            frame = self._program.get((programa, fallback))
+        return frame if frame is not None else self._empty_program
+
+    def client(self, cnpj: str) -> pd.DataFrame:
+        return self._client.get(cnpj, self._empty_client)
+
+    def uf_discounts(self, uf: str) -> pd.DataFrame:
+        return self._uf_discounts.get(uf, self._empty_uf)
+
+
+_snapshot: PricingSnapshot | None = None
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot(db: Session) -> PricingSnapshot | None:
+    """Snapshot for the current sync version, reloading it when a sync bumped it.
+
+    Returns None when snapshots are disabled or cannot be loaded; callers then
+    query the pricing tables directly.
+    """
+    global _snapshot
+    if not settings.pricing_snapshot_enabled:
+        return None
+    try:
+        version = current_version(db)
+    except Exception:
+        db.rollback()
+        logger.exception("Could not read pricing sync version")
+        return None
+
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    with _snapshot_lock:
+        snapshot = _snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        try:
+            snapshot = PricingSnapshot.load(db, version)
+        except Exception:
+            db.rollback()
+            logger.exception("Could not load pricing snapshot")
+            return None
+        _snapshot = snapshot
+        logger.info("Loaded pricing snapshot version %s", version)
+        return snapshot
@@ -70,7 +70,21 @@ def _sync_pricing_programs(db: Session, user: models.User):
             continue
         seen.add(p)
         uniq.append(p)
+    current = db.query(models.PricingClientProgram.programa, models.PricingClientProgram.categoria).filter(
+        models.PricingClientProgram.cod_cliente == cnpj
+    ).order_by(models.PricingClientProgram.id.asc()).all()
+    if [tuple(row) for row in current] == uniq:
+        return
     db.query(models.PricingClientProgram).filter(models.PricingClientProgram.cod_cliente == cnpj).delete()
+    # Cached tables, ETags and download files are keyed by the resolved
+    # program, so nothing else is invalidated; the client's overrides for
+    # programs it lost can no longer be reached.
+    for programa, categoria in set(tuple(row) for row in current) - set(uniq):
+        db.query(models.PricingResultCache).filter(
+            models.PricingResultCache.cnpj == cnpj,
+            models.PricingResultCache.programa == programa,
+            models.PricingResultCache.categoria == categoria,
+        ).delete()
     for programa, categoria in uniq:
         db.add(models.PricingClientProgram(
             cod_empresa="01",
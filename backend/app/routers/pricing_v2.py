@@ -1,18 +1,68 @@
-from datetime import datetime
-import io
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import hashlib
 import logging
 import os
 import re
+from typing import Iterator
 
 import pandas as pd
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import String, and_, case, cast, column, or_, select, table, text
 from sqlalchemy.orm import Session
 
-from app import models
+from app import models, schemas
+from app.compression import (
+    ENCODINGS,
+    compress_chunks,
+    encoding_headers,
+    negotiate_encoding,
+    not_modified_headers,
+    strip_encoding,
+)
 from app.constants import UF_CODE_SET
 from app.core.config import settings
+from app.db import SessionLocal
 from app.dependencies import get_current_admin, get_current_user, get_db
+from app.pricing_artifacts import (
+    ARTIFACT_EXTENSIONS,
+    artifact_path,
+    compressed_artifact,
+    evict_stale_artifacts,
+    get_or_create_artifact,
+    prepare_version_dir,
+    stream_csv_artifact,
+    write_artifact,
+)
+from app.pricing_engine import (
+    CLIENT_COLUMNS,
+    MASTER_COLUMNS,
+    PROGRAM_COLUMNS,
+    UF_COLUMNS,
+    campaign_valid,
+    compute_pricing_rows,
+    format_discount_seq,
+    parse_discount_seq,
+)
+from app.pricing_ingest import (
+    PricingSourceError,
+    iter_source_chunks,
+    load_source_to_table,
+    normalize_cnpj,
+    read_source_frames,
+    read_source_rows,
+    run_source_tasks,
+    source_path,
+    to_float,
+)
+from app.pricing_jobs import SyncJobProgress, create_sync_job, sync_job_status
+from app.pricing_locks import single_flight
+from app.pricing_rows_cache import rows_cache
+from app.pricing_search import ItemSearchIndex
+from app.pricing_snapshot import bump_version, current_sync_state, current_version, get_snapshot, query_frame
+from app.table_formats import cached_table_response, ndjson_response, negotiate_table_format, table_response
 
 router = APIRouter(prefix="/pricing-v2", tags=["pricing-v2"])
 logger = logging.getLogger(__name__)
@@ -33,105 +83,46 @@ CALCULATED_COLUMNS = [
     "PROGRAMA",
     "CATEGORIA",
 ]
-
-
-def _normalize_cnpj(value: str) -> str:
-    return re.sub(r"\D", "", value or "")
+CACHE_KEY_COLUMNS = {"UF", "COD_ITEM", "PROGRAMA", "CATEGORIA"}
+# Cached tables are the shared per-(uf, programa, categoria) base rows with the
+# client's sparse override rows (PricingResultCache) laid over them.
+CACHE_COLUMNS = {
+    name: getattr(models.PricingBaseCache, name.lower())
+    if name in CACHE_KEY_COLUMNS
+    else case(
+        (models.PricingResultCache.id.is_(None), getattr(models.PricingBaseCache, name.lower())),
+        else_=getattr(models.PricingResultCache, name.lower()),
+    )
+    for name in CALCULATED_COLUMNS
+}
+CATEGORY_FALLBACKS = {"STANDARD": "PADRAO"}
+STAGING_SUFFIX = "_staging"
+# Larger index result sets are joined through a per-connection temporary table instead of an IN list.
+SEARCH_IN_LIMIT = 5000
+SEARCH_HITS = table("pricing_search_hits", column("cod_item"))
+QUOTE_MAX_ITEMS = 500
+SOURCE_TABLES = [
+    ("master", models.PricingMasterItem, ["uf", "cod_item"]),
+    ("client_program", models.PricingClientProgram, ["cod_cliente", "programa", "categoria"]),
+    ("program_discount", models.PricingProgramItemDiscount, ["programa", "categoria", "cod_item"]),
+    ("client_discount", models.PricingClientItemDiscount, ["cod_cliente", "cod_item"]),
+    ("uf_discount", models.PricingUfItemDiscount, ["cod_uf", "cod_item"]),
+]
 
 
 def _normalize_uf(value: str | None) -> str:
     return str(value or "").strip().upper()
 
 
-def _to_float(value) -> float:
-    if value is None:
-        return 0.0
-    text = str(value).strip()
-    if not text or text.lower() == "nan":
-        return 0.0
-    text = text.replace("%", "").replace(" ", "")
-    text = text.replace(".", "").replace(",", ".") if text.count(",") == 1 and text.count(".") > 1 else text
-    try:
-        return float(text)
-    except Exception:
-        return 0.0
-
-
-def _parse_discount_seq(raw) -> list[float]:
-    if raw is None:
-        return []
-    text = str(raw).strip()
-    if not text or text.lower() == "nan":
-        return []
-    parts = [p.strip() for p in text.replace("%", "").split("+") if p.strip()]
-    out = []
-    for part in parts:
-        try:
-            out.append(float(part.replace(",", ".")))
-        except Exception:
-            continue
-    return out
-
-
-def _campaign_valid(vald_camp) -> bool:
-    if vald_camp is None or str(vald_camp).strip() == "" or str(vald_camp).lower() == "nan":
-        return False
-    try:
-        camp_date = pd.to_datetime(vald_camp).date()
-        return camp_date >= datetime.utcnow().date()
-    except Exception:
-        return False
-
 def _category_fallback(categoria: str) -> str | None:
     if not categoria:
         return None
-    if categoria.strip().upper() == "STANDARD":
-        return "PADRAO"
-    return None
-
-
-
-def _read_client_programs(path_csv: str) -> pd.DataFrame:
-    if not os.path.exists(path_csv):
-        raise HTTPException(status_code=500, detail=f"Client program file not found: {path_csv}")
-    df = pd.read_csv(path_csv, sep="|", dtype=str, engine="python", on_bad_lines="skip")
-    df.columns = [c.strip() for c in df.columns]
-    for col in ["COD_EMPRESA", "COD_CLIENTE", "PROGRAMA", "CATEGORIA"]:
-        if col in df.columns:
-            df[col] = df[col].astype(str).str.strip()
-    if "COD_EMPRESA" in df.columns:
-        df = df[df["COD_EMPRESA"].str.contains(r"^\d+$", na=False)]
-    return df
-
-
-def _read_discounts(path_xlsm: str):
-    if not os.path.exists(path_xlsm):
-        raise HTTPException(status_code=500, detail=f"Discount workbook not found: {path_xlsm}")
-    prog = pd.read_excel(path_xlsm, sheet_name="PROG_DESC_ITEM", dtype=str)
-    cli = pd.read_excel(path_xlsm, sheet_name="PROG_DESC_ITEM_CLI", dtype=str)
-    uf = pd.read_excel(path_xlsm, sheet_name="UF_ITEM", dtype=str)
-    for df in [prog, cli, uf]:
-        df.columns = [c.strip() for c in df.columns]
-        for c in df.columns:
-            df[c] = df[c].astype(str).str.strip()
-    if "ESTADO" in uf.columns and "COD_UF" not in uf.columns:
-        uf = uf.rename(columns={"ESTADO": "COD_UF"})
-    return prog, cli, uf
-
-
-def _read_master(path_master: str) -> pd.DataFrame:
-    if not os.path.exists(path_master):
-        raise HTTPException(status_code=500, detail=f"Master workbook not found: {path_master}")
-    df = pd.read_excel(path_master, dtype=str)
-    df.columns = [c.strip() for c in df.columns]
-    for col in ["UF", "COD_ITEM", "PRE_UNIT", "ALIQ_IPI", "ALIQ_ST", "IVA"]:
-        if col not in df.columns:
-            raise HTTPException(status_code=500, detail=f"Missing column in master sheet: {col}")
-    return df
+    return CATEGORY_FALLBACKS.get(categoria.strip().upper())
+
 
 
 def _is_test_user(user) -> bool:
-    return _normalize_cnpj(user.cnpj) == TEST_CNPJ
+    return normalize_cnpj(user.cnpj) == TEST_CNPJ
 
 
 def _get_effective_pricing_uf(user, uf_override: str | None = None) -> str:
@@ -154,124 +145,173 @@ def _bulk_insert(db: Session, model_cls, rows: list[dict], chunk_size: int = 200
         db.bulk_insert_mappings(model_cls, chunk)
 
 
-def _load_sources_to_db(db: Session):
-    master = _read_master(settings.pricing_master_path)
-    prog_desc, cli_desc, uf_desc = _read_discounts(settings.pricing_discounts_path)
-    client_prog = _read_client_programs(settings.pricing_client_program_path)
+def _read_source_rows(progress: SyncJobProgress) -> dict[str, list[dict]]:
+    rows = run_source_tasks(
+        [(read_source_rows, (name, source_path(name))) for name, _, _ in SOURCE_TABLES],
+        on_result=lambda _, result: progress.add_rows(len(result)),
+    )
+    return {name: source_rows for (name, _, _), source_rows in zip(SOURCE_TABLES, rows)}
+
+
+def _source_stats(counts: dict[str, int]) -> dict:
+    return {f"{name}_rows": counts[name] for name, _, _ in SOURCE_TABLES}
+
+
+def _supports_staging_swap(db: Session) -> bool:
+    return settings.pricing_sync_staging and db.get_bind().dialect.name == "mysql"
+
+
+def _swap_sources_into_db(db: Session, progress: SyncJobProgress) -> dict[str, int]:
+    """Stream every source file into its shadow table and swap them in atomically.
+
+    Each sheet is parsed and loaded by its own worker process (see
+    ``run_source_tasks``). Readers keep hitting the live tables until the
+    single RENAME TABLE statement switches all five at once; the previous data
+    stays in the *_staging tables until the next full sync.
+
+    Shadow tables are recreated from the live ones on every sync, so they
+    always carry the current columns and indexes, migrations included.
+    """
+    tasks = []
+    renames = []
+    for name, model_cls, _ in SOURCE_TABLES:
+        live = model_cls.__tablename__
+        shadow = f"{live}{STAGING_SUFFIX}"
+        db.execute(text(f"DROP TABLE IF EXISTS {shadow}"))
+        db.execute(text(f"CREATE TABLE {shadow} LIKE {live}"))
+        tasks.append((load_source_to_table, (name, source_path(name), shadow)))
+        renames += [f"{live} TO {live}_old", f"{shadow} TO {live}", f"{live}_old TO {shadow}"]
+    db.commit()
+    # Workers parse and insert in one stream, so this is reported as loading.
+    loaded = run_source_tasks(tasks, on_result=lambda _, count: progress.add_rows(count))
+    counts = {name: count for (name, _, _), count in zip(SOURCE_TABLES, loaded)}
+    db.execute(text("RENAME TABLE " + ", ".join(renames)))
+    db.commit()
+    return counts
+
+
+def _replace_sources_in_db(db: Session, progress: SyncJobProgress) -> dict[str, int]:
+    counts = {}
+    for _, model_cls, _ in SOURCE_TABLES:
+        db.query(model_cls).delete()
+    for name, model_cls, _ in SOURCE_TABLES:
+        counts[name] = 0
+        for chunk in iter_source_chunks(name):
+            db.bulk_insert_mappings(model_cls, chunk)
+            counts[name] += len(chunk)
+            progress.add_rows(len(chunk))
+    return counts
+
+
+def _load_sources_to_db(db: Session, progress: SyncJobProgress):
+    progress.phase("loading")
+    if _supports_staging_swap(db):
+        counts = _swap_sources_into_db(db, progress)
+    else:
+        counts = _replace_sources_in_db(db, progress)
+    return _source_stats(counts)
 
-    db.query(models.PricingMasterItem).delete()
-    db.query(models.PricingClientProgram).delete()
-    db.query(models.PricingProgramItemDiscount).delete()
-    db.query(models.PricingClientItemDiscount).delete()
-    db.query(models.PricingUfItemDiscount).delete()
 
-    master_rows = []
-    for _, row in master.iterrows():
-        cod_item = str(row.get("COD_ITEM", "")).strip()
-        uf = str(row.get("UF", "")).strip().upper()
-        if not cod_item or not uf:
-            continue
-        master_rows.append(
-            {
-                "uf": uf,
-                "num_list": str(row.get("NUM_LIST", "")).strip() or None,
-                "den_list": str(row.get("DEN_LIST", "")).strip() or None,
-                "cod_item": cod_item,
-                "den_item": str(row.get("DEN_ITEM", "")).strip() or None,
-                "um": str(row.get("UM", "")).strip() or None,
-                "cla_fisc": str(row.get("CLA_FISC", "")).strip() or None,
-                "pre_unit": _to_float(row.get("PRE_UNIT")),
-                "aliq_ipi": _to_float(row.get("ALIQ_IPI")),
-                "iva": _to_float(row.get("IVA")),
-                "aliq_st": _to_float(row.get("ALIQ_ST")),
-            }
-        )
+def _diff_value(value):
+    if isinstance(value, pd.Timestamp):
+        return None if pd.isna(value) else value.to_pydatetime()
+    if isinstance(value, float):
+        # Prices live in DECIMAL(18,6) columns; compare at the stored precision.
+        return round(value, 6)
+    return value
 
-    client_rows_map = {}
-    for _, row in client_prog.iterrows():
-        cnpj = _normalize_cnpj(row.get("COD_CLIENTE"))
-        programa = str(row.get("PROGRAMA", "")).strip().upper()
-        categoria = str(row.get("CATEGORIA", "")).strip().upper()
-        if not cnpj or not programa or not categoria:
-            continue
-        key = (cnpj, programa, categoria)
-        client_rows_map[key] = {
-            "cod_empresa": str(row.get("COD_EMPRESA", "")).strip() or None,
-            "cod_cliente": cnpj,
-            "programa": programa,
-            "categoria": categoria,
-        }
-    client_rows = list(client_rows_map.values())
 
-    prog_rows = []
-    for _, row in prog_desc.iterrows():
-        cod_item = str(row.get("COD_ITEM", "")).strip()
-        programa = str(row.get("PROGRAMA", "")).strip().upper()
-        categoria = str(row.get("CATEGORIA", "")).strip().upper()
-        if not cod_item or not programa or not categoria:
-            continue
-        prog_rows.append(
-            {
-                "cod_empresa": str(row.get("COD_EMPRESA", "")).strip() or None,
-                "programa": programa,
-                "categoria": categoria,
-                "cod_item": cod_item,
-                "desc_base": str(row.get("DESC_BASE", "")).strip() or None,
-                "desc_redu": str(row.get("DESC_REDU", "")).strip() or None,
-                "desc_prog": str(row.get("DESC_PROG", "")).strip() or None,
-                "desc_camp": str(row.get("DESC_CAMP", "")).strip() or None,
-                "vald_camp": None if pd.isna(pd.to_datetime(row.get("VALD_CAMP"), errors="coerce")) else pd.to_datetime(row.get("VALD_CAMP"), errors="coerce"),
-            }
-        )
+def _diff_table(db: Session, model_cls, key_cols: list[str], incoming: list[dict]):
+    """Inserts, updates, deletes and touched keys that turn the table into ``incoming``.
 
-    cli_rows = []
-    for _, row in cli_desc.iterrows():
-        cod_item = str(row.get("COD_ITEM", "")).strip()
-        cnpj = _normalize_cnpj(row.get("COD_CLIENTE"))
-        if not cod_item or not cnpj:
+    Rows are grouped by natural key but duplicates are kept, as the full
+    reload keeps them; the engine resolves them (last row wins) when pricing.
+    A key whose rows differ in any way other than one changed value has all
+    its rows deleted and reinserted in sheet order.
+    """
+    if not incoming:
+        value_cols = []
+    else:
+        value_cols = [c for c in incoming[0] if c not in key_cols]
+
+    wanted = {}
+    for row in incoming:
+        wanted.setdefault(tuple(row[c] for c in key_cols), []).append(row)
+
+    columns = [model_cls.id] + [getattr(model_cls, c) for c in key_cols + value_cols]
+    current = {}
+    for record in db.query(*columns).order_by(model_cls.id).all():
+        key = tuple(record[1:1 + len(key_cols)])
+        current.setdefault(key, []).append((record[0], tuple(_diff_value(v) for v in record[1 + len(key_cols):])))
+
+    inserts, updates, deletes, touched = [], [], [], set()
+    for key, rows in wanted.items():
+        existing = current.get(key, [])
+        values = [tuple(_diff_value(row[c]) for c in value_cols) for row in rows]
+        if values == [stored for _, stored in existing]:
             continue
-        cli_rows.append(
-            {
-                "cod_empresa": str(row.get("COD_EMPRESA", "")).strip() or None,
-                "cod_cliente": cnpj,
-                "cod_item": cod_item,
-                "desc_cli": str(row.get("DESC_CLI", "")).strip() or None,
-            }
-        )
-
-    uf_rows = []
-    for _, row in uf_desc.iterrows():
-        cod_item = str(row.get("COD_ITEM", "")).strip()
-        cod_uf = str(row.get("COD_UF", "")).strip().upper()
-        if not cod_item or not cod_uf:
+        touched.add(key)
+        if len(rows) == 1 and len(existing) == 1:
+            updates.append({"id": existing[0][0], **rows[0]})
             continue
-        uf_rows.append(
-            {
-                "cod_empresa": str(row.get("COD_EMPRESA", "")).strip() or None,
-                "cod_uf": cod_uf,
-                "cod_item": cod_item,
-                "desc_uf": str(row.get("DESC_UF", "")).strip() or None,
-            }
-        )
-
-    _bulk_insert(db, models.PricingMasterItem, master_rows)
-    _bulk_insert(db, models.PricingClientProgram, client_rows)
-    _bulk_insert(db, models.PricingProgramItemDiscount, prog_rows)
-    _bulk_insert(db, models.PricingClientItemDiscount, cli_rows)
-    _bulk_insert(db, models.PricingUfItemDiscount, uf_rows)
-
-    return {
-        "master_rows": len(master_rows),
-        "client_program_rows": len(client_rows),
-        "program_discount_rows": len(prog_rows),
-        "client_discount_rows": len(cli_rows),
-        "uf_discount_rows": len(uf_rows),
-    }
+        deletes += [record_id for record_id, _ in existing]
+        inserts += rows
+    for key, existing in current.items():
+        if key not in wanted:
+            deletes += [record_id for record_id, _ in existing]
+            touched.add(key)
+    return inserts, updates, deletes, touched
+
+
+def _apply_source_diff(db: Session, progress: SyncJobProgress) -> tuple[dict, dict[str, set]]:
+    progress.phase("parsing")
+    sources = _read_source_rows(progress)
+    progress.phase("loading")
+    changes = {}
+    touched = {}
+    for name, model_cls, key_cols in SOURCE_TABLES:
+        inserts, updates, deletes, touched_keys = _diff_table(db, model_cls, key_cols, sources[name])
+        for i in range(0, len(deletes), 2000):
+            db.query(model_cls).filter(model_cls.id.in_(deletes[i:i + 2000])).delete(synchronize_session=False)
+        for i in range(0, len(updates), 2000):
+            db.bulk_update_mappings(model_cls, updates[i:i + 2000])
+        _bulk_insert(db, model_cls, inserts)
+        changes[name] = {"inserted": len(inserts), "updated": len(updates), "deleted": len(deletes)}
+        touched[name] = touched_keys
+        progress.add_rows(len(inserts) + len(updates) + len(deletes))
+    counts = {name: len(rows) for name, rows in sources.items()}
+    return {**_source_stats(counts), "changes": changes}, touched
+
+
+def _invalidate_cache(db: Session, touched: dict[str, set]) -> int:
+    """Delete cached tables whose inputs changed in an incremental sync."""
+    ufs = {key[0] for key in touched["master"]} | {key[0] for key in touched["uf_discount"]}
+    cnpjs = {key[0] for key in touched["client_program"]} | {key[0] for key in touched["client_discount"]}
+    pairs = {(key[0], key[1]) for key in touched["program_discount"]}
+    # Tables priced through the category fallback depend on the fallback rows too.
+    for categoria, fallback in CATEGORY_FALLBACKS.items():
+        pairs |= {(programa, categoria) for programa, cat in list(pairs) if cat == fallback}
+
+    deleted = 0
+    for cache in (models.PricingBaseCache, models.PricingResultCache):
+        conditions = []
+        if ufs:
+            conditions.append(cache.uf.in_(sorted(ufs)))
+        for programa, categoria in sorted(pairs):
+            conditions.append(and_(cache.programa == programa, cache.categoria == categoria))
+        if cache is models.PricingResultCache:
+            # Client programs and discounts only feed the per-client overrides.
+            cnpj_list = sorted(cnpjs)
+            for i in range(0, len(cnpj_list), 500):
+                conditions.append(cache.cnpj.in_(cnpj_list[i:i + 500]))
+        for i in range(0, len(conditions), 200):
+            deleted += db.query(cache).filter(or_(*conditions[i:i + 200])).delete(synchronize_session=False)
+    return deleted
 
 
 def _list_client_programs(db: Session, cnpj: str) -> list[tuple[str, str]]:
     rows = db.query(models.PricingClientProgram).filter(
-        models.PricingClientProgram.cod_cliente == _normalize_cnpj(cnpj)
+        models.PricingClientProgram.cod_cliente == normalize_cnpj(cnpj)
     ).all()
     out = []
     for r in rows:
@@ -300,174 +340,469 @@ def _list_master_ufs(db: Session) -> list[str]:
     return out
 
 
-def _compute_rows_from_db(db: Session, cnpj: str, uf: str, programa: str, categoria: str) -> tuple[str, str, list[dict]]:
+def _pricing_inputs(db: Session, cnpj: str, uf: str, programa: str, categoria: str):
+    fallback = _category_fallback(categoria)
+    snapshot = get_snapshot(db)
+    if snapshot is not None:
+        master = snapshot.master(uf)
+        if master is None:
+            raise HTTPException(status_code=404, detail=f"No master prices found for UF {uf}")
+        return (
+            master,
+            snapshot.program(programa, categoria, fallback),
+            snapshot.client(cnpj),
+            snapshot.uf_discounts(uf),
+        )
 
-    base_items = db.query(models.PricingMasterItem).filter(models.PricingMasterItem.uf == uf).all()
-    if not base_items:
+    master = query_frame(db, models.PricingMasterItem, MASTER_COLUMNS, models.PricingMasterItem.uf == uf)
+    if master.empty:
         raise HTTPException(status_code=404, detail=f"No master prices found for UF {uf}")
-
-    pmap = {
-        item.cod_item: item
-        for item in db.query(models.PricingProgramItemDiscount).filter(
+    uf_discounts = query_frame(
+        db,
+        models.PricingUfItemDiscount,
+        UF_COLUMNS,
+        models.PricingUfItemDiscount.cod_uf == uf,
+    )
+    return master, _query_program_frame(db, programa, categoria, fallback), _query_client_frame(db, cnpj), uf_discounts
+
+
+def _query_program_frame(db: Session, programa: str, categoria: str, fallback: str | None) -> pd.DataFrame:
+    program = query_frame(
+        db,
+        models.PricingProgramItemDiscount,
+        PROGRAM_COLUMNS,
+        models.PricingProgramItemDiscount.programa == programa,
+        models.PricingProgramItemDiscount.categoria == categoria,
+    )
+    if program.empty and fallback:
+        program = query_frame(
+            db,
+            models.PricingProgramItemDiscount,
+            PROGRAM_COLUMNS,
             models.PricingProgramItemDiscount.programa == programa,
-            models.PricingProgramItemDiscount.categoria == categoria,
-        ).all()
-    }
-    if not pmap:
-        fallback = _category_fallback(categoria)
-        if fallback:
-            pmap = {
-                item.cod_item: item
-                for item in db.query(models.PricingProgramItemDiscount).filter(
-                    models.PricingProgramItemDiscount.programa == programa,
-                    models.PricingProgramItemDiscount.categoria == fallback,
-                ).all()
-            }
-    cmap = {
-        item.cod_item: item
-        for item in db.query(models.PricingClientItemDiscount).filter(
-            models.PricingClientItemDiscount.cod_cliente == cnpj
-        ).all()
-    }
-    umap = {
-        item.cod_item: item
-        for item in db.query(models.PricingUfItemDiscount).filter(
-            models.PricingUfItemDiscount.cod_uf == uf
-        ).all()
-    }
+            models.PricingProgramItemDiscount.categoria == fallback,
+        )
+    return program
+
+
+def _query_client_frame(db: Session, cnpj: str) -> pd.DataFrame:
+    return query_frame(
+        db,
+        models.PricingClientItemDiscount,
+        CLIENT_COLUMNS,
+        models.PricingClientItemDiscount.cod_cliente == cnpj,
+    )
+
+
+def _all_uf_pricing_inputs(db: Session, cnpj: str, programa: str, categoria: str):
+    """Like ``_pricing_inputs`` for every UF at once: one master/UF-discount frame spanning all UFs."""
+    fallback = _category_fallback(categoria)
+    snapshot = get_snapshot(db)
+    if snapshot is not None:
+        ufs = [uf for uf in snapshot.ufs() if uf in UF_CODE_SET]
+        if not ufs:
+            raise HTTPException(status_code=404, detail="No master prices found")
+        # Empty frames are left out of the concat: pandas warns about their dtypes.
+        uf_frames = [frame for frame in (snapshot.uf_discounts(uf) for uf in ufs) if not frame.empty]
+        return (
+            pd.concat([snapshot.master(uf).assign(uf=uf) for uf in ufs], ignore_index=True),
+            snapshot.program(programa, categoria, fallback),
+            snapshot.client(cnpj),
+            pd.concat(uf_frames, ignore_index=True) if uf_frames else pd.DataFrame(columns=UF_COLUMNS),
+        )
+
+    master = query_frame(db, models.PricingMasterItem, MASTER_COLUMNS)
+    master["uf"] = master["uf"].map({raw: _normalize_uf(raw) for raw in master["uf"].unique()})
+    master = master[master["uf"].isin(UF_CODE_SET)]
+    if master.empty:
+        raise HTTPException(status_code=404, detail="No master prices found")
+    uf_discounts = query_frame(db, models.PricingUfItemDiscount, UF_COLUMNS)
+    return master, _query_program_frame(db, programa, categoria, fallback), _query_client_frame(db, cnpj), uf_discounts
+
+
+def _compute_rows_from_db(db: Session, cnpj: str, uf: str, programa: str, categoria: str) -> tuple[str, str, list[dict]]:
+    master, program, client, uf_discounts = _pricing_inputs(db, cnpj, uf, programa, categoria)
+    master = master.assign(uf=uf)
+    rows = compute_pricing_rows(master, program, client, uf_discounts, programa, categoria)
+    return programa, categoria, rows
+
 
+def _compute_all_uf_rows(db: Session, cnpj: str, programa: str, categoria: str) -> list[dict]:
+    """Price a client's program/categoria in every UF with one engine pass, ordered by (UF, COD_ITEM).
+
+    Program and client discounts are loaded once and shared by all UFs;
+    UF discounts join on (uf, cod_item) inside ``compute_pricing_rows``.
+    """
+    master, program, client, uf_discounts = _all_uf_pricing_inputs(db, cnpj, programa, categoria)
+    master = master.sort_values(["uf", "cod_item"], kind="stable")
+    return compute_pricing_rows(master, program, client, uf_discounts, programa, categoria)
+
+
+def _item_program_frame(db: Session, programa: str, categoria: str, cod_items: list[str]) -> pd.DataFrame:
+    # Same categoria fallback as _pricing_inputs: only when the whole categoria has no rows.
+    model = models.PricingProgramItemDiscount
+    fallback = _category_fallback(categoria)
+    if fallback and db.query(model.id).filter(model.programa == programa, model.categoria == categoria).first() is None:
+        categoria = fallback
+    return query_frame(
+        db, model, PROGRAM_COLUMNS, model.programa == programa, model.categoria == categoria, model.cod_item.in_(cod_items)
+    )
+
+
+def _compute_item_rows(db: Session, cnpj: str, cod_item: str, programs: list[tuple[str, str]]) -> list[dict]:
+    """One item's price in every UF for each of the client's programs, ordered by program then UF.
+
+    Every query is a point lookup on a cod_item-bearing index, so no UF
+    catalog or program table is read in full.
+    """
+    master = query_frame(db, models.PricingMasterItem, MASTER_COLUMNS, models.PricingMasterItem.cod_item == cod_item)
+    master["uf"] = master["uf"].map(_normalize_uf)
+    master = master[master["uf"].isin(UF_CODE_SET)].sort_values("uf", kind="stable")
+    if master.empty:
+        raise HTTPException(status_code=404, detail="Item not found")
+    client = query_frame(
+        db,
+        models.PricingClientItemDiscount,
+        CLIENT_COLUMNS,
+        models.PricingClientItemDiscount.cod_cliente == cnpj,
+        models.PricingClientItemDiscount.cod_item == cod_item,
+    )
+    uf_discounts = query_frame(
+        db, models.PricingUfItemDiscount, UF_COLUMNS, models.PricingUfItemDiscount.cod_item == cod_item
+    )
     rows = []
-    for item in base_items:
-        cod_item = item.cod_item
-        seq = []
+    for programa, categoria in programs:
+        program = _item_program_frame(db, programa, categoria, [cod_item])
+        rows += compute_pricing_rows(master, program, client, uf_discounts, programa, categoria)
+    return rows
+
+
+def _compute_items_rows(
+    db: Session, cnpj: str, uf: str, programa: str, categoria: str, cod_items: list[str]
+) -> dict[str, dict]:
+    """Prices of just ``cod_items`` in one UF, by COD_ITEM.
+
+    Like ``_compute_item_rows``, every query is a point lookup on a
+    cod_item-bearing index, so the UF catalog is never read in full.
+    """
+    cod_items = sorted(set(cod_items))
+    master = query_frame(
+        db,
+        models.PricingMasterItem,
+        MASTER_COLUMNS,
+        models.PricingMasterItem.uf == uf,
+        models.PricingMasterItem.cod_item.in_(cod_items),
+    )
+    if master.empty:
+        return {}
+    client = query_frame(
+        db,
+        models.PricingClientItemDiscount,
+        CLIENT_COLUMNS,
+        models.PricingClientItemDiscount.cod_cliente == cnpj,
+        models.PricingClientItemDiscount.cod_item.in_(cod_items),
+    )
+    uf_discounts = query_frame(
+        db,
+        models.PricingUfItemDiscount,
+        UF_COLUMNS,
+        models.PricingUfItemDiscount.cod_uf == uf,
+        models.PricingUfItemDiscount.cod_item.in_(cod_items),
+    )
+    program = _item_program_frame(db, programa, categoria, cod_items)
+    rows = compute_pricing_rows(master.assign(uf=uf), program, client, uf_discounts, programa, categoria)
+    return {row["COD_ITEM"]: row for row in rows}
+
+
+def _pivot_all_uf_rows(rows: list[dict], value: str) -> tuple[list[str], list[dict]]:
+    """One row per COD_ITEM with ``value`` of each UF as a column."""
+    ufs = sorted({row["UF"] for row in rows})
+    items = {}
+    for row in rows:
+        item = items.get(row["COD_ITEM"])
+        if item is None:
+            item = items[row["COD_ITEM"]] = {"COD_ITEM": row["COD_ITEM"], "DEN_ITEM": row["DEN_ITEM"], **dict.fromkeys(ufs)}
+        item[row["UF"]] = row[value]
+    return ["COD_ITEM", "DEN_ITEM"] + ufs, [items[cod_item] for cod_item in sorted(items)]
 
-        p = pmap.get(cod_item)
-        if p is not None:
-            seq += _parse_discount_seq(p.desc_base)
-            seq += _parse_discount_seq(p.desc_redu)
-            seq += _parse_discount_seq(p.desc_prog)
-            if _campaign_valid(p.vald_camp):
-                seq += _parse_discount_seq(p.desc_camp)
 
-        c = cmap.get(cod_item)
-        if c is not None:
-            seq += _parse_discount_seq(c.desc_cli)
+def _compute_base_rows(db: Session, uf: str, programa: str, categoria: str) -> list[dict]:
+    """Prices for every item of a UF and program/categoria, without client discounts."""
+    master, program, client, uf_discounts = _pricing_inputs(db, "", uf, programa, categoria)
+    return compute_pricing_rows(master.assign(uf=uf), program, client, uf_discounts, programa, categoria)
 
-        u = umap.get(cod_item)
-        if u is not None:
-            seq += _parse_discount_seq(u.desc_uf)
 
-        price = float(item.pre_unit or 0.0)
-        for pct in seq:
-            price = price * (1 - (pct / 100.0))
+def _compute_override_rows(db: Session, cnpj: str, uf: str, programa: str, categoria: str) -> list[dict]:
+    """Prices for only the items the client has its own discount on."""
+    master, program, client, uf_discounts = _pricing_inputs(db, cnpj, uf, programa, categoria)
+    if client.empty:
+        return []
+    master = master[master["cod_item"].isin(client["cod_item"])]
+    return compute_pricing_rows(master.assign(uf=uf), program, client, uf_discounts, programa, categoria)
 
-        aliq_ipi = float(item.aliq_ipi or 0.0)
-        aliq_st = float(item.aliq_st or 0.0)
-        valor_ipi = price * (aliq_ipi / 100.0)
-        valor_st = price * (aliq_st / 100.0)
 
-        rows.append(
-            {
-                "UF": uf,
-                "COD_ITEM": cod_item,
-                "DEN_ITEM": item.den_item,
-                "PRE_UNIT": round(float(item.pre_unit or 0.0), 2),
-                "DESCONTOS_CASCATA": "+".join(str(int(x) if float(x).is_integer() else x) for x in seq),
-                "BASE_LIQUIDA": round(price, 2),
-                "ALIQ_IPI": aliq_ipi,
-                "ALIQ_ST": aliq_st,
-                "VALOR_IPI": round(valor_ipi, 2),
-                "VALOR_ST": round(valor_st, 2),
-                "VALOR_FINAL": round(price + valor_ipi + valor_st, 2),
-                "PROGRAMA": programa,
-                "CATEGORIA": categoria,
-            }
-        )
+def _cache_record(row: dict, uf: str, programa: str, categoria: str, source: str, now: datetime) -> dict:
+    return {
+        "uf": uf,
+        "cod_item": row.get("COD_ITEM"),
+        "den_item": row.get("DEN_ITEM"),
+        "pre_unit": to_float(row.get("PRE_UNIT")),
+        "descontos_cascata": row.get("DESCONTOS_CASCATA"),
+        "base_liquida": to_float(row.get("BASE_LIQUIDA")),
+        "aliq_ipi": to_float(row.get("ALIQ_IPI")),
+        "aliq_st": to_float(row.get("ALIQ_ST")),
+        "valor_ipi": to_float(row.get("VALOR_IPI")),
+        "valor_st": to_float(row.get("VALOR_ST")),
+        "valor_final": to_float(row.get("VALOR_FINAL")),
+        "programa": programa,
+        "categoria": categoria,
+        "source": source,
+        "updated_at": now,
+    }
 
-    return programa, categoria, rows
+
+def _upsert_base_cache(db: Session, uf: str, programa: str, categoria: str, rows: list[dict], source: str):
+    db.query(models.PricingBaseCache).filter(
+        models.PricingBaseCache.uf == uf,
+        models.PricingBaseCache.programa == programa,
+        models.PricingBaseCache.categoria == categoria,
+    ).delete()
+    now = datetime.utcnow()
+    payload = [_cache_record(row, uf, programa, categoria, source, now) for row in rows]
+    _bulk_insert(db, models.PricingBaseCache, payload)
 
 
 def _upsert_cache(db: Session, cnpj: str, uf: str, programa: str, categoria: str, rows: list[dict], source: str):
+    """Replace the client's override rows for one table."""
     db.query(models.PricingResultCache).filter(
         models.PricingResultCache.cnpj == cnpj,
         models.PricingResultCache.uf == uf,
         models.PricingResultCache.programa == programa,
         models.PricingResultCache.categoria == categoria,
     ).delete()
-
     now = datetime.utcnow()
-    payload = []
-    for row in rows:
-        payload.append(
-            {
-                "cnpj": cnpj,
-                "uf": uf,
-                "cod_item": row.get("COD_ITEM"),
-                "den_item": row.get("DEN_ITEM"),
-                "pre_unit": _to_float(row.get("PRE_UNIT")),
-                "descontos_cascata": row.get("DESCONTOS_CASCATA"),
-                "base_liquida": _to_float(row.get("BASE_LIQUIDA")),
-                "aliq_ipi": _to_float(row.get("ALIQ_IPI")),
-                "aliq_st": _to_float(row.get("ALIQ_ST")),
-                "valor_ipi": _to_float(row.get("VALOR_IPI")),
-                "valor_st": _to_float(row.get("VALOR_ST")),
-                "valor_final": _to_float(row.get("VALOR_FINAL")),
-                "programa": programa,
-                "categoria": categoria,
-                "source": source,
-                "updated_at": now,
-            }
-        )
+    payload = [{"cnpj": cnpj, **_cache_record(row, uf, programa, categoria, source, now)} for row in rows]
     _bulk_insert(db, models.PricingResultCache, payload)
 
 
-def _get_cached_rows(db: Session, cnpj: str, uf: str, programa: str, categoria: str) -> tuple[str, str, list[dict]]:
-    cache_rows = db.query(models.PricingResultCache).filter(
+def _client_has_discounts(db: Session, cnpj: str) -> bool:
+    snapshot = get_snapshot(db)
+    if snapshot is not None:
+        return not snapshot.client(cnpj).empty
+    return db.query(models.PricingClientItemDiscount.id).filter(
+        models.PricingClientItemDiscount.cod_cliente == cnpj
+    ).first() is not None
+
+
+def _base_exists(db: Session, uf: str, programa: str, categoria: str) -> bool:
+    return db.query(models.PricingBaseCache.id).filter(
+        models.PricingBaseCache.uf == uf,
+        models.PricingBaseCache.programa == programa,
+        models.PricingBaseCache.categoria == categoria,
+    ).first() is not None
+
+
+def _override_exists(db: Session, cnpj: str, uf: str, programa: str, categoria: str) -> bool:
+    return db.query(models.PricingResultCache.id).filter(
         models.PricingResultCache.cnpj == cnpj,
         models.PricingResultCache.uf == uf,
         models.PricingResultCache.programa == programa,
         models.PricingResultCache.categoria == categoria,
-    ).order_by(models.PricingResultCache.cod_item.asc()).all()
+    ).first() is not None
 
-    if not cache_rows:
-        return programa, categoria, []
 
-    rows = []
-    for r in cache_rows:
-        rows.append(
-            {
-                "UF": r.uf,
-                "COD_ITEM": r.cod_item,
-                "DEN_ITEM": r.den_item,
-                "PRE_UNIT": round(float(r.pre_unit or 0.0), 2),
-                "DESCONTOS_CASCATA": r.descontos_cascata or "",
-                "BASE_LIQUIDA": round(float(r.base_liquida or 0.0), 2),
-                "ALIQ_IPI": float(r.aliq_ipi or 0.0),
-                "ALIQ_ST": float(r.aliq_st or 0.0),
-                "VALOR_IPI": round(float(r.valor_ipi or 0.0), 2),
-                "VALOR_ST": round(float(r.valor_st or 0.0), 2),
-                "VALOR_FINAL": round(float(r.valor_final or 0.0), 2),
-                "PROGRAMA": r.programa,
-                "CATEGORIA": r.categoria,
-            }
+def _client_items_in_catalog(db: Session, cnpj: str, uf: str) -> bool:
+    """Whether any item the client has a discount on is sold in the UF, i.e. whether it gets override rows."""
+    snapshot = get_snapshot(db)
+    if snapshot is not None:
+        master = snapshot.master(uf)
+        return master is not None and bool(master["cod_item"].isin(snapshot.client(cnpj)["cod_item"]).any())
+    client_items = db.query(models.PricingClientItemDiscount.cod_item).filter(
+        models.PricingClientItemDiscount.cod_cliente == cnpj
+    )
+    return db.query(models.PricingMasterItem.id).filter(
+        models.PricingMasterItem.uf == uf,
+        models.PricingMasterItem.cod_item.in_(client_items),
+    ).first() is not None
+
+
+def _override_ready(db: Session, cnpj: str, uf: str, programa: str, categoria: str) -> bool:
+    """Whether the client's override rows for a table are stored, or it has none there.
+
+    Clients without item discounts read the base table as is; so do clients
+    whose discounts match no item of the UF, which store no override rows.
+    """
+    if not _client_has_discounts(db, cnpj) or _override_exists(db, cnpj, uf, programa, categoria):
+        return True
+    return not _client_items_in_catalog(db, cnpj, uf)
+
+
+def _cache_exists(db: Session, cnpj: str, uf: str, programa: str, categoria: str) -> bool:
+    return _base_exists(db, uf, programa, categoria) and _override_ready(db, cnpj, uf, programa, categoria)
+
+
+def _cache_row_to_dict(r) -> dict:
+    return {
+        "UF": r.uf,
+        "COD_ITEM": r.cod_item,
+        "DEN_ITEM": r.den_item,
+        "PRE_UNIT": round(float(r.pre_unit or 0.0), 2),
+        "DESCONTOS_CASCATA": r.descontos_cascata or "",
+        "BASE_LIQUIDA": round(float(r.base_liquida or 0.0), 2),
+        "ALIQ_IPI": float(r.aliq_ipi or 0.0),
+        "ALIQ_ST": float(r.aliq_st or 0.0),
+        "VALOR_IPI": round(float(r.valor_ipi or 0.0), 2),
+        "VALOR_ST": round(float(r.valor_st or 0.0), 2),
+        "VALOR_FINAL": round(float(r.valor_final or 0.0), 2),
+        "PROGRAMA": r.programa,
+        "CATEGORIA": r.categoria,
+    }
+
+
+def _cache_query(db: Session, cnpj: str, uf: str, programa: str, categoria: str):
+    base = models.PricingBaseCache
+    override = models.PricingResultCache
+    return (
+        db.query(*[column.label(name.lower()) for name, column in CACHE_COLUMNS.items()])
+        .select_from(base)
+        .outerjoin(
+            override,
+            and_(
+                override.cnpj == cnpj,
+                override.uf == base.uf,
+                override.programa == base.programa,
+                override.categoria == base.categoria,
+                override.cod_item == base.cod_item,
+            ),
         )
-    return programa, categoria, rows
+        .filter(base.uf == uf, base.programa == programa, base.categoria == categoria)
+    )
+
+
+def _get_table_rows(user, db: Session, cnpj: str, uf: str, programa: str, categoria: str) -> list[dict]:
+    """A full priced table from this worker's LRU, else from the cache tables (filling them if needed)."""
+    key = (cnpj, uf, programa, categoria)
+    version = current_version(db)
+    rows = rows_cache.get(key, version)
+    if rows is None:
+        if not _cache_exists(db, cnpj, uf, programa, categoria):
+            _compute_and_cache(user, db, cnpj, uf, programa, categoria)
+        _, _, rows = _get_cached_rows(db, cnpj, uf, programa, categoria)
+        rows_cache.put(key, version, rows)
+    return rows
+
+
+def _get_cached_rows(db: Session, cnpj: str, uf: str, programa: str, categoria: str) -> tuple[str, str, list[dict]]:
+    cache_rows = _cache_query(db, cnpj, uf, programa, categoria).order_by(models.PricingBaseCache.cod_item.asc()).all()
+    return programa, categoria, [_cache_row_to_dict(r) for r in cache_rows]
+
+
+def _get_cached_items(
+    db: Session, cnpj: str, uf: str, programa: str, categoria: str, cod_items: list[str]
+) -> dict[str, dict]:
+    """Cached rows for just ``cod_items``, by COD_ITEM; point lookups on the (uf, programa, categoria, cod_item) key."""
+    query = _cache_query(db, cnpj, uf, programa, categoria).filter(
+        models.PricingBaseCache.cod_item.in_(sorted(set(cod_items)))
+    )
+    return {row.cod_item: _cache_row_to_dict(row) for row in query}
+
 
+def _artifact_owner(cnpj: str, has_discounts: bool) -> str:
+    # Clients without item discounts all get the base table, so they share its files.
+    return cnpj if has_discounts else ""
 
-def _build_payload_from_files(user, programa: str, categoria: str, uf_override: str | None = None) -> dict:
-    master = _read_master(settings.pricing_master_path)
-    prog_desc, cli_desc, uf_desc = _read_discounts(settings.pricing_discounts_path)
-    client_prog = _read_client_programs(settings.pricing_client_program_path)
+
+def _iter_cached_rows(cnpj: str, uf: str, programa: str, categoria: str, batch_size: int = 1000) -> Iterator[dict]:
+    """Cached rows in COD_ITEM order, fetched ``batch_size`` at a time.
+
+    Opens its own session because streaming responses outlive the request's.
+    """
+    db = SessionLocal()
+    try:
+        query = _cache_query(db, cnpj, uf, programa, categoria).order_by(models.PricingBaseCache.cod_item.asc())
+        for r in query.yield_per(batch_size):
+            yield _cache_row_to_dict(r)
+    finally:
+        db.close()
+
+
+def _get_cached_page(
+    db: Session,
+    cnpj: str,
+    uf: str,
+    programa: str,
+    categoria: str,
+    offset: int,
+    limit: int,
+    search: str | None = None,
+    col: str | None = None,
+    sort: str | None = None,
+    order: str = "asc",
+    cod_items: list[str] | None = None,
+) -> tuple[int, list[dict]]:
+    """One page of a cached table plus the filtered row count, both computed in SQL.
+
+    The base table's (uf, programa, categoria, cod_item) unique key covers the
+    default ordering and the override join, so an unsearched page only reads
+    ``limit`` index entries.
+    ``cod_items`` are search matches already resolved by the in-memory index
+    (ascending) for its fields; the other columns are still searched in SQL.
+    When ``col`` is an indexed field and the order is COD_ITEM, the page is
+    sliced from them directly.
+    """
+    cache = models.PricingBaseCache
+    query = _cache_query(db, cnpj, uf, programa, categoria)
+    if cod_items is not None and col and (sort or "COD_ITEM") == "COD_ITEM":
+        ordered = cod_items[::-1] if order == "desc" else cod_items
+        page = ordered[offset:offset + limit]
+        records = query.filter(cache.cod_item.in_(page)).all() if page else []
+        by_item = {r.cod_item: r for r in records}
+        return len(cod_items), [_cache_row_to_dict(by_item[c]) for c in page if c in by_item]
+    if search:
+        names = [col] if col in CACHE_COLUMNS else list(CACHE_COLUMNS)
+        conditions = []
+        if cod_items is not None:
+            # Indexed fields match accent-insensitively through the index only.
+            names = [name for name in names if name not in ItemSearchIndex.FIELDS]
+            conditions.append(_search_hits_filter(db, cod_items))
+        conditions += [cast(CACHE_COLUMNS[name], String).icontains(search, autoescape=True) for name in names]
+        query = query.filter(or_(*conditions))
+
+    total = query.order_by(None).count()
+    sort_column = CACHE_COLUMNS.get(sort or "COD_ITEM", cache.cod_item)
+    ordering = [sort_column.desc() if order == "desc" else sort_column.asc()]
+    if sort_column is not cache.cod_item:
+        ordering.append(cache.cod_item.asc())
+    records = query.order_by(*ordering).offset(offset).limit(limit).all()
+    return total, [_cache_row_to_dict(r) for r in records]
+
+
+def _read_file_frames() -> tuple:
+    try:
+        return read_source_frames()
+    except PricingSourceError as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+
+
+def _build_payload_from_files(
+    user,
+    programa: str,
+    categoria: str,
+    uf_override: str | None = None,
+    include_client: bool = True,
+    frames: tuple | None = None,
+) -> dict:
+    master, prog_desc, cli_desc, uf_desc, client_prog = frames or _read_file_frames()
 
     required_client_cols = {"COD_CLIENTE", "PROGRAMA", "CATEGORIA"}
     missing = required_client_cols - set(client_prog.columns)
     if missing:
         raise HTTPException(status_code=500, detail=f"Missing columns in client program file: {', '.join(sorted(missing))}")
 
-    cnpj = _normalize_cnpj(user.cnpj)
+    cnpj = normalize_cnpj(user.cnpj)
     uf = _get_effective_pricing_uf(user, uf_override)
 
-    cp = client_prog[client_prog["COD_CLIENTE"].apply(_normalize_cnpj) == cnpj]
+    cp = client_prog[client_prog["COD_CLIENTE"].apply(normalize_cnpj) == cnpj]
     if cp.empty:
         raise HTTPException(status_code=404, detail="Program/categoria not found for client")
 
@@ -488,8 +823,8 @@ def _build_payload_from_files(user, programa: str, categoria: str, uf_override:
     else:
         pmap = pd.DataFrame()
 
-    if all(c in cli_desc.columns for c in ["COD_CLIENTE", "COD_ITEM"]):
-        cmap = cli_desc[cli_desc["COD_CLIENTE"].apply(_normalize_cnpj) == cnpj]
+    if include_client and all(c in cli_desc.columns for c in ["COD_CLIENTE", "COD_ITEM"]):
+        cmap = cli_desc[cli_desc["COD_CLIENTE"].apply(normalize_cnpj) == cnpj]
         cmap = cmap.set_index("COD_ITEM") if not cmap.empty else pd.DataFrame()
     else:
         cmap = pd.DataFrame()
@@ -511,30 +846,30 @@ def _build_payload_from_files(user, programa: str, categoria: str, uf_override:
             r = pmap.loc[cod_item]
             if isinstance(r, pd.DataFrame):
                 r = r.iloc[0]
-            seq += _parse_discount_seq(r.get("DESC_BASE"))
-            seq += _parse_discount_seq(r.get("DESC_REDU"))
-            seq += _parse_discount_seq(r.get("DESC_PROG"))
-            if _campaign_valid(r.get("VALD_CAMP")):
-                seq += _parse_discount_seq(r.get("DESC_CAMP"))
+            seq += parse_discount_seq(r.get("DESC_BASE"))
+            seq += parse_discount_seq(r.get("DESC_REDU"))
+            seq += parse_discount_seq(r.get("DESC_PROG"))
+            if campaign_valid(r.get("VALD_CAMP")):
+                seq += parse_discount_seq(r.get("DESC_CAMP"))
 
         if not cmap.empty and cod_item in cmap.index:
             r = cmap.loc[cod_item]
             if isinstance(r, pd.DataFrame):
                 r = r.iloc[0]
-            seq += _parse_discount_seq(r.get("DESC_CLI"))
+            seq += parse_discount_seq(r.get("DESC_CLI"))
 
         if not umap.empty and cod_item in umap.index:
             r = umap.loc[cod_item]
             if isinstance(r, pd.DataFrame):
                 r = r.iloc[0]
-            seq += _parse_discount_seq(r.get("DESC_UF"))
+            seq += parse_discount_seq(r.get("DESC_UF"))
 
-        price = _to_float(row.get("PRE_UNIT"))
+        price = to_float(row.get("PRE_UNIT"))
         for pct in seq:
             price = price * (1 - (pct / 100.0))
 
-        aliq_ipi = _to_float(row.get("ALIQ_IPI"))
-        aliq_st = _to_float(row.get("ALIQ_ST"))
+        aliq_ipi = to_float(row.get("ALIQ_IPI"))
+        aliq_st = to_float(row.get("ALIQ_ST"))
         valor_ipi = price * (aliq_ipi / 100.0)
         valor_st = price * (aliq_st / 100.0)
 
@@ -543,8 +878,8 @@ def _build_payload_from_files(user, programa: str, categoria: str, uf_override:
                 "UF": uf,
                 "COD_ITEM": cod_item,
                 "DEN_ITEM": row.get("DEN_ITEM"),
-                "PRE_UNIT": round(_to_float(row.get("PRE_UNIT")), 2),
-                "DESCONTOS_CASCATA": "+".join(str(int(x) if float(x).is_integer() else x) for x in seq),
+                "PRE_UNIT": round(to_float(row.get("PRE_UNIT")), 2),
+                "DESCONTOS_CASCATA": format_discount_seq(seq),
                 "BASE_LIQUIDA": round(price, 2),
                 "ALIQ_IPI": aliq_ipi,
                 "ALIQ_ST": aliq_st,
@@ -567,20 +902,90 @@ def _build_payload_from_files(user, programa: str, categoria: str, uf_override:
     }
 
 
-def _build_pricing_payload(
+def _search_hits_filter(db: Session, cod_items: list[str]):
+    """Restrict the cached table to the index's ``cod_items``.
+
+    Large hit sets go through a temporary table, which lives as long as the
+    pooled connection and is refilled per search, instead of a huge IN list.
+    """
+    if len(cod_items) <= SEARCH_IN_LIMIT:
+        return models.PricingBaseCache.cod_item.in_(cod_items)
+    db.execute(text("CREATE TEMPORARY TABLE IF NOT EXISTS pricing_search_hits (cod_item VARCHAR(30) PRIMARY KEY)"))
+    db.execute(text("DELETE FROM pricing_search_hits"))
+    db.execute(SEARCH_HITS.insert(), [{"cod_item": cod_item} for cod_item in cod_items])
+    return models.PricingBaseCache.cod_item.in_(select(SEARCH_HITS.c.cod_item))
+
+
+def _indexed_search(db: Session, uf: str, search: str | None, col: str | None) -> list[str] | None:
+    """COD_ITEMs whose indexed fields match ``search``, or None to search in SQL only.
+
+    The snapshot's item index covers COD_ITEM and DEN_ITEM. Searches on one of
+    them use it alone; searches without ``col`` use it for those two and SQL
+    for the other columns. Other ``col`` values stay in SQL.
+    """
+    if not search or (col and col not in ItemSearchIndex.FIELDS):
+        return None
+    snapshot = get_snapshot(db)
+    index = snapshot.search_index(uf) if snapshot is not None else None
+    if index is None:
+        return None
+    return index.search(search, col)
+
+
+def _pricing_etag(version: int, cnpj: str, uf: str, programa: str, categoria: str, variant: str) -> str:
+    key = f"{version}|{cnpj}|{uf}|{programa}|{categoria}|{variant}"
+    return '"' + hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # Compressed representations carry a suffixed ETag; they validate the same content.
+    candidates = [strip_encoding(value.strip()) for value in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def _conditional_headers(
+    db: Session,
+    request: Request,
+    cnpj: str,
+    uf: str,
+    programa: str,
+    categoria: str,
+    variant: str,
+) -> tuple[int, dict, bool]:
+    """Sync version, validators for a priced table and whether the client's copy is still current.
+
+    Cached tables only change when a sync publishes a new version, so the
+    version plus the table key identify the content without reading it.
+    """
+    version, updated_at = current_sync_state(db)
+    headers = {
+        "ETag": _pricing_etag(version, cnpj, uf, programa, categoria, variant),
+        "Cache-Control": "private, no-cache",
+    }
+    last_modified = updated_at.replace(tzinfo=timezone.utc, microsecond=0) if updated_at else None
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        return version, headers, _etag_matches(if_none_match, headers["ETag"])
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            return version, headers, last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return version, headers, False
+    return version, headers, False
+
+
+def _resolve_pricing_target(
     user,
     db: Session,
     programa: str | None = None,
     categoria: str | None = None,
-    strict_test_user: bool = False,
     uf_override: str | None = None,
-) -> dict:
-    if not _is_test_user(user):
-        if strict_test_user:
-            raise HTTPException(status_code=403, detail="em desenvolvimento")
-        return {"status": "em desenvolvimento"}
-
-    cnpj = _normalize_cnpj(user.cnpj)
+) -> tuple[str, str, str, str]:
+    cnpj = normalize_cnpj(user.cnpj)
     uf = _get_effective_pricing_uf(user, uf_override)
 
     programs = _list_client_programs(db, cnpj)
@@ -593,29 +998,80 @@ def _build_pricing_payload(
         programa, categoria = target
     else:
         programa, categoria = programs[0]
+    return cnpj, uf, programa, categoria
 
-    programa, categoria, rows = _get_cached_rows(db, cnpj, uf, programa, categoria)
-    if not rows:
-        try:
-            programa, categoria, rows = _compute_rows_from_db(db, cnpj, uf, programa, categoria)
-            _upsert_cache(db, cnpj, uf, programa, categoria, rows, source="db")
+
+def _base_flight(uf: str, programa: str, categoria: str) -> str:
+    return f"base|{uf}|{programa}|{categoria}"
+
+
+def _override_flight(cnpj: str, uf: str, programa: str, categoria: str) -> str:
+    return f"override|{cnpj}|{uf}|{programa}|{categoria}"
+
+
+def _fill_base_cache(user, db: Session, uf: str, programa: str, categoria: str):
+    try:
+        rows = _compute_base_rows(db, uf, programa, categoria)
+        source = "db"
+    except Exception:
+        db.rollback()
+        rows = _build_payload_from_files(user, programa, categoria, uf, include_client=False)["rows"]
+        source = "file"
+    _upsert_base_cache(db, uf, programa, categoria, rows, source=source)
+    db.commit()
+
+
+def _fill_override_cache(user, db: Session, cnpj: str, uf: str, programa: str, categoria: str):
+    try:
+        rows = _compute_override_rows(db, cnpj, uf, programa, categoria)
+        source = "db"
+    except Exception:
+        db.rollback()
+        frames = _read_file_frames()
+        base_rows = _build_payload_from_files(user, programa, categoria, uf, include_client=False, frames=frames)["rows"]
+        client_rows = _build_payload_from_files(user, programa, categoria, uf, frames=frames)["rows"]
+        by_item = {row["COD_ITEM"]: row for row in base_rows}
+        rows = [row for row in client_rows if row != by_item.get(row["COD_ITEM"])]
+        source = "file"
+    _upsert_cache(db, cnpj, uf, programa, categoria, rows, source=source)
+    db.commit()
+
+
+def _compute_and_cache(user, db: Session, cnpj: str, uf: str, programa: str, categoria: str):
+    """Fill whatever is missing of the base table and the client's overrides.
+
+    Each part is computed under ``single_flight``, so concurrent requests for
+    a missing table wait for one computation instead of repeating it (and
+    colliding on the cache's unique keys).
+    """
+    if not _base_exists(db, uf, programa, categoria):
+        with single_flight(db, _base_flight(uf, programa, categoria)):
+            # New transaction, so the check sees what the previous holder committed.
             db.commit()
-        except Exception:
-            db.rollback()
-            file_payload = _build_payload_from_files(user, programa, categoria, uf_override=uf)
-            _upsert_cache(
-                db,
-                cnpj,
-                uf,
-                file_payload["programa"],
-                file_payload["categoria"],
-                file_payload["rows"],
-                source="file",
-            )
+            if not _base_exists(db, uf, programa, categoria):
+                _fill_base_cache(user, db, uf, programa, categoria)
+    if not _override_ready(db, cnpj, uf, programa, categoria):
+        with single_flight(db, _override_flight(cnpj, uf, programa, categoria)):
             db.commit()
-            programa = file_payload["programa"]
-            categoria = file_payload["categoria"]
-            rows = file_payload["rows"]
+            if not _override_ready(db, cnpj, uf, programa, categoria):
+                _fill_override_cache(user, db, cnpj, uf, programa, categoria)
+
+
+def _build_pricing_payload(
+    user,
+    db: Session,
+    programa: str | None = None,
+    categoria: str | None = None,
+    strict_test_user: bool = False,
+    uf_override: str | None = None,
+) -> dict:
+    if not _is_test_user(user):
+        if strict_test_user:
+            raise HTTPException(status_code=403, detail="em desenvolvimento")
+        return {"status": "em desenvolvimento"}
+
+    cnpj, uf, programa, categoria = _resolve_pricing_target(user, db, programa, categoria, uf_override)
+    rows = _get_table_rows(user, db, cnpj, uf, programa, categoria)
 
     return {
         "status": "ok",
@@ -627,47 +1083,230 @@ def _build_pricing_payload(
     }
 
 
-@router.post("/sync")
-def sync_pricing_sources(db: Session = Depends(get_db), admin=Depends(get_current_admin)):
+def _warmup_targets(db: Session, cnpjs: set[str] | None = None, all_ufs: bool = True) -> list[tuple[str, str, str, str]]:
+    """(cnpj, uf, programa, categoria) cache entries to precompute after a sync.
+
+    Every client's own UF (from its user account) comes first so the tables
+    clients open by default are ready soonest; the other UFs follow.
+    """
+    programs = {}
+    for raw_cnpj, raw_prog, raw_cat in db.query(
+        models.PricingClientProgram.cod_cliente,
+        models.PricingClientProgram.programa,
+        models.PricingClientProgram.categoria,
+    ).order_by(models.PricingClientProgram.id.asc()):
+        cnpj = normalize_cnpj(raw_cnpj)
+        prog = (raw_prog or "").strip().upper()
+        cat = (raw_cat or "").strip().upper()
+        if not cnpj or not prog or not cat or (cnpjs is not None and cnpj not in cnpjs):
+            continue
+        pairs = programs.setdefault(cnpj, [])
+        if (prog, cat) not in pairs:
+            pairs.append((prog, cat))
+
+    own_ufs = {normalize_cnpj(cnpj): _normalize_uf(uf) for cnpj, uf in db.query(models.User.cnpj, models.User.uf)}
+    ufs = _list_master_ufs(db)
+    first, rest = [], []
+    for cnpj, pairs in programs.items():
+        own_uf = own_ufs.get(cnpj)
+        for uf in ufs:
+            if uf != own_uf and not all_ufs:
+                continue
+            target = first if uf == own_uf else rest
+            target.extend((cnpj, uf, programa, categoria) for programa, categoria in pairs)
+    return first + rest
+
+
+def _warm_base_entry(uf: str, programa: str, categoria: str) -> int | None:
+    """Compute and store one shared base table; None when it was already cached."""
+    db = SessionLocal()
     try:
-        stats = _load_sources_to_db(db) or {}
-        db.query(models.PricingResultCache).delete()
-        test_user = db.query(models.User).filter(models.User.cnpj == TEST_CNPJ).first()
-        rebuilt_cache = False
-        rebuilt_cache_states = []
-        rebuilt_cache_tables = 0
-        if test_user:
-            programs = _list_client_programs(db, TEST_CNPJ)
-            for uf in _list_master_ufs(db):
-                for programa, categoria in programs:
-                    programa, categoria, rows = _compute_rows_from_db(db, TEST_CNPJ, uf, programa, categoria)
-                    _upsert_cache(db, TEST_CNPJ, uf, programa, categoria, rows, source="db")
-                    rebuilt_cache_tables += 1
-                if programs:
-                    rebuilt_cache_states.append(uf)
-            rebuilt_cache = rebuilt_cache_tables > 0
-        db.commit()
-        return {
-            "status": "ok",
-            "rebuilt_cache": rebuilt_cache,
-            "rebuilt_cache_states": rebuilt_cache_states,
-            "rebuilt_cache_tables": rebuilt_cache_tables,
-            **stats,
-        }
-    except HTTPException:
+        with single_flight(db, _base_flight(uf, programa, categoria)):
+            if _base_exists(db, uf, programa, categoria):
+                return None
+            rows = _compute_base_rows(db, uf, programa, categoria)
+            _upsert_base_cache(db, uf, programa, categoria, rows, source="db")
+            db.commit()
+            return len(rows)
+    except Exception:
         db.rollback()
         raise
-    except Exception as exc:
+    finally:
+        db.close()
+
+
+def _warm_override_entry(cnpj: str, uf: str, programa: str, categoria: str) -> int | None:
+    """Compute and store one client's override rows; None when they were already cached."""
+    db = SessionLocal()
+    try:
+        with single_flight(db, _override_flight(cnpj, uf, programa, categoria)):
+            if _override_ready(db, cnpj, uf, programa, categoria):
+                return None
+            rows = _compute_override_rows(db, cnpj, uf, programa, categoria)
+            _upsert_cache(db, cnpj, uf, programa, categoria, rows, source="db")
+            db.commit()
+            return len(rows)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _warm_artifacts(version: int, cnpj: str, uf: str, programa: str, categoria: str, has_discounts: bool):
+    owner = _artifact_owner(cnpj, has_discounts)
+    for fmt in ARTIFACT_EXTENSIONS:
+        path = get_or_create_artifact(
+            version,
+            owner,
+            uf,
+            programa,
+            categoria,
+            fmt,
+            lambda: _iter_cached_rows(owner, uf, programa, categoria),
+            CALCULATED_COLUMNS,
+        )
+        if fmt == "csv" and settings.response_compression_enabled:
+            for encoding in ENCODINGS:
+                compressed_artifact(path, encoding)
+
+
+def _run_warm_tasks(tasks: list[tuple], progress: SyncJobProgress) -> tuple[int, int]:
+    rebuilt = 0
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, settings.pricing_warmup_workers)) as executor:
+        futures = {executor.submit(fn, *args): args for fn, args in tasks}
+        for future in as_completed(futures):
+            try:
+                row_count = future.result()
+            except Exception:
+                failed += 1
+                logger.exception("Pricing cache warm-up failed for %s", futures[future])
+                continue
+            if row_count is not None:
+                rebuilt += 1
+                progress.add_rows(row_count)
+    return rebuilt, failed
+
+
+def _warm_cache(db: Session, version: int, progress: SyncJobProgress) -> dict:
+    if settings.pricing_warmup_enabled:
+        targets = _warmup_targets(db, all_ufs=settings.pricing_warmup_all_ufs)
+    else:
+        test_user = db.query(models.User).filter(models.User.cnpj == TEST_CNPJ).first()
+        targets = _warmup_targets(db, cnpjs={TEST_CNPJ}) if test_user else []
+    discount_cnpjs = {cnpj for cnpj, in db.query(models.PricingClientItemDiscount.cod_cliente).distinct()}
+    db.commit()
+
+    # Base tables first (in the targets' priority order), then the sparse
+    # overrides of the clients that have item discounts.
+    bases = list(dict.fromkeys((uf, programa, categoria) for _, uf, programa, categoria in targets))
+    overrides = [target for target in targets if target[0] in discount_cnpjs]
+    rebuilt_bases, failed_bases = _run_warm_tasks([(_warm_base_entry, key) for key in bases], progress)
+    rebuilt_overrides, failed_overrides = _run_warm_tasks([(_warm_override_entry, key) for key in overrides], progress)
+    failed = failed_bases + failed_overrides
+
+    if settings.pricing_artifact_warmup:
+        artifact_keys = {}
+        for cnpj, uf, programa, categoria in targets:
+            has_discounts = cnpj in discount_cnpjs
+            artifact_keys.setdefault((_artifact_owner(cnpj, has_discounts), uf, programa, categoria), has_discounts)
+        _, failed_artifacts = _run_warm_tasks(
+            [(_warm_artifacts, (version, *key, has_discounts)) for key, has_discounts in artifact_keys.items()],
+            progress,
+        )
+        failed += failed_artifacts
+
+    return {
+        "rebuilt_cache": rebuilt_bases + rebuilt_overrides > 0,
+        "rebuilt_cache_states": sorted({uf for _, uf, _, _ in targets}),
+        "rebuilt_cache_tables": rebuilt_bases + rebuilt_overrides,
+        "rebuilt_base_tables": rebuilt_bases,
+        "rebuilt_override_tables": rebuilt_overrides,
+        "warmup_clients": len({cnpj for cnpj, _, _, _ in targets}),
+        "warmup_failed": failed,
+    }
+
+
+def _run_sync(db: Session, mode: str, progress: SyncJobProgress) -> dict:
+    if mode == "incremental":
+        stats, touched = _apply_source_diff(db, progress)
+        stats["invalidated_cache_rows"] = _invalidate_cache(db, touched)
+    else:
+        stats = _load_sources_to_db(db, progress) or {}
+        db.query(models.PricingBaseCache).delete()
+        db.query(models.PricingResultCache).delete()
+    changed = mode == "full" or any(sum(c.values()) for c in stats["changes"].values())
+    sync_version = bump_version(db) if changed else current_version(db)
+    db.commit()
+
+    progress.phase("cache_rebuild")
+    evict_stale_artifacts(sync_version)
+    # Loading the new version's snapshot here also publishes its Arrow files,
+    # which the other workers then map instead of querying MySQL.
+    snapshot = get_snapshot(db)
+    warmup = _warm_cache(db, sync_version, progress)
+    if snapshot is not None:
+        for uf in snapshot.ufs():
+            snapshot.search_index(uf)
+    return {
+        "status": "ok",
+        "mode": mode,
+        "sync_version": sync_version,
+        **warmup,
+        **stats,
+    }
+
+
+def _run_sync_job(job_id: int, mode: str):
+    progress = SyncJobProgress(job_id)
+    progress.start()
+    db = SessionLocal()
+    try:
+        progress.finish(_run_sync(db, mode, progress))
+    except HTTPException as exc:
         db.rollback()
-        logger.exception("Unexpected pricing-v2 sync error")
-        raise HTTPException(status_code=500, detail="Unexpected pricing sync error")
+        progress.fail(str(exc.detail))
+    except PricingSourceError as exc:
+        db.rollback()
+        progress.fail(str(exc))
+    except Exception:
+        db.rollback()
+        logger.exception("Unexpected pricing-v2 sync error (job %s)", job_id)
+        progress.fail("Unexpected pricing sync error")
+    finally:
+        db.close()
+
+
+@router.post("/sync", status_code=202)
+def sync_pricing_sources(
+    background_tasks: BackgroundTasks,
+    mode: str = Query("full", pattern="^(full|incremental)$"),
+    db: Session = Depends(get_db),
+    admin=Depends(get_current_admin),
+):
+    """Queue a pricing sync; poll GET /pricing-v2/sync/{job_id} for its progress."""
+    job, created = create_sync_job(db, mode, admin.id)
+    db.commit()
+    if not created:
+        raise HTTPException(status_code=409, detail=f"Pricing sync already in progress (job {job.id})")
+    background_tasks.add_task(_run_sync_job, job.id, mode)
+    return {"status": "queued", "job_id": job.id, "mode": mode}
+
+
+@router.get("/sync/{job_id}")
+def sync_job_status_v2(job_id: int, db: Session = Depends(get_db), admin=Depends(get_current_admin)):
+    job = db.query(models.PricingSyncJob).filter(models.PricingSyncJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Sync job not found")
+    return sync_job_status(job)
 
 
 @router.get("/my-tables")
 def my_tables(db: Session = Depends(get_db), user=Depends(get_current_user)):
     if not _is_test_user(user):
         return {"status": "em desenvolvimento", "items": []}
-    cnpj = _normalize_cnpj(user.cnpj)
+    cnpj = normalize_cnpj(user.cnpj)
     items = []
     for programa, categoria in _list_client_programs(db, cnpj):
         sheet_id = f"pricing-v2:{programa}:{categoria}"
@@ -678,12 +1317,42 @@ def my_tables(db: Session = Depends(get_db), user=Depends(get_current_user)):
 
 @router.get("/my-table")
 def my_table_v2(
+    request: Request,
     uf: str | None = Query(None, min_length=2, max_length=2),
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
 ):
     try:
-        return _build_pricing_payload(user, db, uf_override=uf)
+        if not _is_test_user(user):
+            return _build_pricing_payload(user, db, uf_override=uf)
+        cnpj, uf, programa, categoria = _resolve_pricing_target(user, db, uf_override=uf)
+        fmt = negotiate_table_format(request)
+        version, headers, not_modified = _conditional_headers(db, request, cnpj, uf, programa, categoria, fmt)
+        if not_modified:
+            return Response(status_code=304, headers=not_modified_headers(request, {**headers, "Vary": "Accept"}))
+        if fmt == "ndjson":
+            # Rows go out as they are read from the cache tables (or this
+            # worker's LRU) instead of being collected into one document.
+            rows = rows_cache.get((cnpj, uf, programa, categoria), version)
+            if rows is None:
+                if not _cache_exists(db, cnpj, uf, programa, categoria):
+                    _compute_and_cache(user, db, cnpj, uf, programa, categoria)
+                rows = _iter_cached_rows(cnpj, uf, programa, categoria)
+            meta = {
+                "status": "ok",
+                "title": CALCULATED_TITLE,
+                "client_cnpj": cnpj,
+                "programa": programa,
+                "categoria": categoria,
+                "columns": CALCULATED_COLUMNS,
+            }
+            return ndjson_response(request, meta, rows, headers)
+        cache_key = (cnpj, uf, programa, categoria)
+        cached = cached_table_response(request, fmt, headers, cache_key, version)
+        if cached is not None:
+            return cached
+        payload = _build_pricing_payload(user, db, programa=programa, categoria=categoria, uf_override=uf)
+        return table_response(request, payload, CALCULATED_COLUMNS, headers, fmt, cache_key=cache_key, version=version)
     except HTTPException:
         raise
     except Exception as exc:
@@ -691,12 +1360,99 @@ def my_table_v2(
         raise HTTPException(status_code=500, detail="Unexpected pricing error")
 
 
+@router.get("/my-table/all-ufs")
+def my_table_v2_all_ufs(
+    request: Request,
+    layout: str = Query("long", pattern="^(long|matrix)$"),
+    value: str = "VALOR_FINAL",
+    programa: str | None = None,
+    categoria: str | None = None,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    try:
+        if not _is_test_user(user):
+            raise HTTPException(status_code=403, detail="em desenvolvimento")
+        if layout == "matrix" and value not in CALCULATED_COLUMNS:
+            raise HTTPException(status_code=400, detail="Invalid value column")
+        cnpj, _, programa, categoria = _resolve_pricing_target(user, db, programa, categoria)
+        variant = f"all-ufs:{layout}:{value}"
+        version, headers, not_modified = _conditional_headers(db, request, cnpj, "*", programa, categoria, variant)
+        if not_modified:
+            return Response(status_code=304, headers=not_modified_headers(request, headers))
+        cache_key = (cnpj, "*", programa, categoria, variant)
+        cached = cached_table_response(request, "json", headers, cache_key, version)
+        if cached is not None:
+            return cached
+
+        rows = _compute_all_uf_rows(db, cnpj, programa, categoria)
+        payload = {"status": "ok", "title": CALCULATED_TITLE, "client_cnpj": cnpj, "programa": programa, "categoria": categoria}
+        if layout == "matrix":
+            columns, matrix = _pivot_all_uf_rows(rows, value)
+            payload = {**payload, "value": value, "columns": columns, "rows": matrix}
+        else:
+            payload = {**payload, "columns": CALCULATED_COLUMNS, "rows": rows}
+        # Always JSON: the matrix rows are lists, which the other formats do not take.
+        return table_response(request, payload, headers=headers, fmt="json", cache_key=cache_key, version=version)
+    except HTTPException:
+        raise
+    except Exception as exc:
+        logger.exception("Unexpected pricing-v2 all-ufs error")
+        raise HTTPException(status_code=500, detail="Unexpected pricing error")
+
+
+@router.get("/items/{cod_item}")
+def item_prices_v2(
+    cod_item: str,
+    request: Request,
+    response: Response,
+    programa: str | None = None,
+    categoria: str | None = None,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    try:
+        if not _is_test_user(user):
+            raise HTTPException(status_code=403, detail="em desenvolvimento")
+        cod_item = cod_item.strip()
+        cnpj = normalize_cnpj(user.cnpj)
+        if programa and categoria:
+            programs = [_resolve_pricing_target(user, db, programa, categoria)[2:]]
+        else:
+            programs = _list_client_programs(db, cnpj)
+            if not programs:
+                raise HTTPException(status_code=404, detail="Program/categoria not found for client")
+        program_key = ",".join(f"{p}/{c}" for p, c in programs)
+        _, headers, not_modified = _conditional_headers(db, request, cnpj, "*", program_key, "", f"item:{cod_item}")
+        if not_modified:
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+
+        rows = _compute_item_rows(db, cnpj, cod_item, programs)
+        return {
+            "status": "ok",
+            "client_cnpj": cnpj,
+            "cod_item": cod_item,
+            "den_item": rows[0]["DEN_ITEM"] if rows else None,
+            "columns": CALCULATED_COLUMNS,
+            "rows": rows,
+        }
+    except HTTPException:
+        raise
+    except Exception as exc:
+        logger.exception("Unexpected pricing-v2 item error")
+        raise HTTPException(status_code=500, detail="Unexpected pricing error")
+
+
 @router.get("/my-table/data")
 def my_table_v2_data(
+    request: Request,
     offset: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
     search: str | None = None,
     col: str | None = None,
+    sort: str | None = None,
+    order: str = Query("asc", pattern="^(asc|desc)$"),
     programa: str | None = None,
     categoria: str | None = None,
     uf: str | None = Query(None, min_length=2, max_length=2),
@@ -704,24 +1460,30 @@ def my_table_v2_data(
     user=Depends(get_current_user),
 ):
     try:
-        payload = _build_pricing_payload(
-            user,
-            db,
-            programa=programa,
-            categoria=categoria,
-            strict_test_user=True,
-            uf_override=uf,
+        if not _is_test_user(user):
+            raise HTTPException(status_code=403, detail="em desenvolvimento")
+        if sort and sort not in CACHE_COLUMNS:
+            raise HTTPException(status_code=400, detail="Invalid sort column")
+        cnpj, uf, programa, categoria = _resolve_pricing_target(user, db, programa, categoria, uf)
+        if not search and (sort or "COD_ITEM") == "COD_ITEM":
+            # A table this worker's LRU already holds is sliced as is; pages
+            # never load one into it, they stay O(page size) in SQL.
+            table = rows_cache.get((cnpj, uf, programa, categoria), current_version(db))
+            if table is not None:
+                ordered = table[::-1] if order == "desc" else table
+                rows = ordered[offset:offset + limit]
+                return table_response(
+                    request,
+                    {"columns": CALCULATED_COLUMNS, "rows": rows, "total": len(table), "offset": offset, "limit": limit},
+                )
+        if not _cache_exists(db, cnpj, uf, programa, categoria):
+            _compute_and_cache(user, db, cnpj, uf, programa, categoria)
+        cod_items = _indexed_search(db, uf, search, col)
+        total, rows = _get_cached_page(db, cnpj, uf, programa, categoria, offset, limit, search, col, sort, order, cod_items)
+        return table_response(
+            request,
+            {"columns": CALCULATED_COLUMNS, "rows": rows, "total": total, "offset": offset, "limit": limit},
         )
-        df = pd.DataFrame(payload["rows"], columns=CALCULATED_COLUMNS)
-        if search:
-            if col and col in df.columns:
-                mask = df[col].astype(str).str.contains(search, case=False, na=False)
-            else:
-                mask = df.astype(str).apply(lambda r: r.str.contains(search, case=False, na=False)).any(axis=1)
-            df = df[mask]
-
-        df = df.iloc[offset:offset + limit]
-        return {"columns": CALCULATED_COLUMNS, "rows": df.to_dict(orient="records")}
     except HTTPException:
         raise
     except Exception as exc:
@@ -731,6 +1493,7 @@ def my_table_v2_data(
 
 @router.get("/my-table/download")
 def my_table_v2_download(
+    request: Request,
     format: str = Query("excel", pattern="^(excel|csv)$"),
     programa: str | None = None,
     categoria: str | None = None,
@@ -739,36 +1502,99 @@ def my_table_v2_download(
     user=Depends(get_current_user),
 ):
     try:
-        payload = _build_pricing_payload(
-            user,
-            db,
-            programa=programa,
-            categoria=categoria,
-            strict_test_user=True,
-            uf_override=uf,
-        )
-        df = pd.DataFrame(payload["rows"], columns=CALCULATED_COLUMNS)
-        safe_title = re.sub(r"[^\w\- ]", "", payload.get("title") or CALCULATED_TITLE).strip().replace(" ", "_")
+        if not _is_test_user(user):
+            raise HTTPException(status_code=403, detail="em desenvolvimento")
+        cnpj, uf, programa, categoria = _resolve_pricing_target(user, db, programa, categoria, uf)
+        version, conditional, not_modified = _conditional_headers(db, request, cnpj, uf, programa, categoria, format)
+        if not_modified:
+            return Response(status_code=304, headers=not_modified_headers(request, conditional, compressible=format == "csv"))
+        safe_title = re.sub(r"[^\w\- ]", "", CALCULATED_TITLE).strip().replace(" ", "_")
+        csv_headers = {"Content-Disposition": f'attachment; filename="{safe_title}.csv"', **conditional}
+        # XLSX files are zip archives already; only CSV is worth compressing.
+        encoding = negotiate_encoding(request) if format == "csv" else None
+        owner = _artifact_owner(cnpj, _client_has_discounts(db, cnpj))
+        path = artifact_path(version, owner, uf, programa, categoria, format)
+        if not os.path.exists(path):
+            if not _cache_exists(db, cnpj, uf, programa, categoria):
+                _compute_and_cache(user, db, cnpj, uf, programa, categoria)
+            prepare_version_dir(version)
+            rows = _iter_cached_rows(owner, uf, programa, categoria)
+            if format == "csv":
+                # First download of this version: stream straight from the
+                # cache table and keep the bytes as the artifact.
+                chunks = stream_csv_artifact(path, rows, CALCULATED_COLUMNS)
+                return StreamingResponse(
+                    compress_chunks(chunks, encoding) if encoding else chunks,
+                    media_type="text/csv",
+                    headers=encoding_headers(csv_headers, encoding),
+                )
+            write_artifact(path, rows, CALCULATED_COLUMNS, format)
 
         if format == "csv":
-            buffer = io.StringIO()
-            df.to_csv(buffer, index=False)
-            data = io.BytesIO(buffer.getvalue().encode("utf-8"))
-            headers = {"Content-Disposition": f'attachment; filename="{safe_title}.csv"'}
-            return StreamingResponse(data, media_type="text/csv", headers=headers)
-
-        data = io.BytesIO()
-        with pd.ExcelWriter(data, engine="openpyxl") as writer:
-            df.to_excel(writer, index=False, sheet_name="Tabela")
-        data.seek(0)
-        headers = {"Content-Disposition": f'attachment; filename="{safe_title}.xlsx"'}
-        return StreamingResponse(
-            data,
+            if encoding and os.path.getsize(path) >= settings.response_compression_min_bytes:
+                # Compressed once per version and served from disk afterwards.
+                return FileResponse(compressed_artifact(path, encoding), media_type="text/csv", headers=encoding_headers(csv_headers, encoding))
+            return FileResponse(path, media_type="text/csv", headers=encoding_headers(csv_headers, None))
+
+        headers = {"Content-Disposition": f'attachment; filename="{safe_title}.xlsx"', **conditional}
+        return FileResponse(
+            path,
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers=headers,
+            headers=encoding_headers(headers, None),
         )
     except HTTPException:
         raise
     except Exception as exc:
         logger.exception("Unexpected pricing-v2 download error")
         raise HTTPException(status_code=500, detail="Unexpected pricing error")
+
+
+@router.post("/quote")
+def quote_v2(
+    payload: schemas.PricingQuoteRequest,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    try:
+        if not _is_test_user(user):
+            raise HTTPException(status_code=403, detail="em desenvolvimento")
+        if not payload.items:
+            raise HTTPException(status_code=400, detail="Quote has no items")
+        if len(payload.items) > QUOTE_MAX_ITEMS:
+            raise HTTPException(status_code=400, detail=f"Quote is limited to {QUOTE_MAX_ITEMS} items")
+        if any(item.quantidade <= 0 for item in payload.items):
+            raise HTTPException(status_code=400, detail="Quantity must be positive")
+        cnpj, uf, programa, categoria = _resolve_pricing_target(user, db, payload.programa, payload.categoria, payload.uf)
+        cod_items = [str(item.cod_item).strip() for item in payload.items]
+        if _cache_exists(db, cnpj, uf, programa, categoria):
+            prices = _get_cached_items(db, cnpj, uf, programa, categoria, cod_items)
+        else:
+            # Pricing a whole cold table for a cart is not worth it; the
+            # table endpoints fill the cache when someone browses it.
+            prices = _compute_items_rows(db, cnpj, uf, programa, categoria, cod_items)
+
+        lines = []
+        not_found = []
+        total = 0.0
+        for item, cod_item in zip(payload.items, cod_items):
+            row = prices.get(cod_item)
+            if row is None:
+                not_found.append(cod_item)
+                continue
+            line_total = round(row["VALOR_FINAL"] * item.quantidade, 2)
+            total += line_total
+            lines.append({**row, "QUANTIDADE": item.quantidade, "VALOR_TOTAL": line_total})
+        return {
+            "uf": uf,
+            "programa": programa,
+            "categoria": categoria,
+            "columns": CALCULATED_COLUMNS + ["QUANTIDADE", "VALOR_TOTAL"],
+            "lines": lines,
+            "total": round(total, 2),
+            "not_found": not_found,
+        }
+    except HTTPException:
+        raise
+    except Exception as exc:
+        logger.exception("Unexpected pricing-v2 quote error")
+        raise HTTPException(status_code=500, detail="Unexpected pricing error")
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session, joinedload
 from app import models
 from app.dependencies import get_db, get_current_user
+from app.table_formats import table_response
 import pandas as pd
 import numpy as np
 import os
@@ -83,6 +84,7 @@ def list_spreadsheets(db: Session = Depends(get_db), user=Depends(get_current_us
 @router.get("/{spreadsheet_id}/data")
 def get_spreadsheet_data(
     spreadsheet_id: int,
+    request: Request,
     offset: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
     search: str | None = None,
@@ -121,10 +123,13 @@ def get_spreadsheet_data(
             df[column] = df[column].apply(_format_brl)
     # sanitize to JSON-safe values
     df = df.replace({np.inf: None, -np.inf: None, np.nan: None})
-    return {
-        "columns": list(df.columns),
-        "rows": df.to_dict(orient="records"),
-    }
+    return table_response(
+        request,
+        {
+            "columns": list(df.columns),
+            "rows": df.to_dict(orient="records"),
+        },
+    )
 
 @router.get("/{spreadsheet_id}/download")
 def download_spreadsheet(
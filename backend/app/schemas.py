@@ -85,3 +85,15 @@ class InvoiceItem(BaseModel):
 class InvoiceSyncResult(BaseModel):
     id: int
     status: str
+
+
+class PricingQuoteItem(BaseModel):
+    cod_item: str
+    quantidade: float = 1
+
+
+class PricingQuoteRequest(BaseModel):
+    items: List[PricingQuoteItem]
+    uf: Optional[str] = None
+    programa: Optional[str] = None
+    categoria: Optional[str] = None
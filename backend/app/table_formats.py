@@ -0,0 +1,169 @@
+from datetime import date, datetime
+from typing import Iterable, Iterator
+
+import orjson
+import pyarrow as pa
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+from app.compression import compress_body, compress_chunks, encoding_headers, negotiate_encoding, parse_accept
+from app.pricing_rows_cache import body_cache
+
+JSON_MEDIA_TYPE = "application/json"
+COLUMNAR_MEDIA_TYPE = "application/vnd.portal.columnar+json"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+TABLE_FORMATS = {
+    JSON_MEDIA_TYPE: "json",
+    COLUMNAR_MEDIA_TYPE: "columnar",
+    ARROW_MEDIA_TYPE: "arrow",
+    NDJSON_MEDIA_TYPE: "ndjson",
+}
+MEDIA_TYPES = {fmt: media_type for media_type, fmt in TABLE_FORMATS.items()}
+NDJSON_CHUNK_BYTES = 64 * 1024
+
+
+def negotiate_table_format(request: Request) -> str:
+    """"json", "columnar", "arrow" or "ndjson", whichever the Accept header ranks highest; "json" by default."""
+    best, best_q = "json", -1.0
+    for media_type, q in parse_accept(request.headers.get("accept", "")):
+        fmt = TABLE_FORMATS.get(media_type)
+        if fmt is None:
+            continue
+        if q > best_q and q > 0:
+            best, best_q = fmt, q
+    return best
+
+
+def _json_default(value):
+    # pandas Timestamps and other datetime subclasses, like FastAPI's encoder.
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps_json(payload) -> bytes:
+    return orjson.dumps(payload, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+def _arrow_array(values: list) -> pa.Array:
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed-type spreadsheet columns travel as text.
+        return pa.array([None if value is None else str(value) for value in values], type=pa.string())
+
+
+def encode_arrow(columns: list[str], rows: list[dict], meta: dict) -> bytes:
+    """Arrow IPC stream of ``rows``; the remaining payload fields ride along as JSON schema metadata."""
+    table = pa.table(
+        {str(column): _arrow_array([row.get(column) for row in rows]) for column in columns},
+    ).replace_schema_metadata({"meta": dumps_json(meta)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def iter_ndjson(meta: dict, rows: Iterable[dict], chunk_size: int = NDJSON_CHUNK_BYTES) -> Iterator[bytes]:
+    """NDJSON lines: ``meta`` first, then one object per row, in chunks of roughly ``chunk_size`` bytes."""
+    buffer = bytearray(dumps_json(meta))
+    buffer += b"\n"
+    for row in rows:
+        buffer += dumps_json(row)
+        buffer += b"\n"
+        if len(buffer) >= chunk_size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def ndjson_response(request: Request, meta: dict, rows: Iterable[dict], headers: dict | None = None) -> StreamingResponse:
+    """Stream ``rows`` as NDJSON without materializing them; ``rows`` may be a generator."""
+    encoding = negotiate_encoding(request)
+    chunks = iter_ndjson(meta, rows)
+    return StreamingResponse(
+        compress_chunks(chunks, encoding) if encoding else chunks,
+        media_type=NDJSON_MEDIA_TYPE,
+        headers=encoding_headers({**(headers or {}), "Vary": "Accept"}, encoding),
+    )
+
+
+def _encode_table(payload: dict, columns: list[str] | None, fmt: str) -> bytes:
+    if fmt == "json":
+        return dumps_json(payload)
+    rows = payload["rows"]
+    meta = {key: value for key, value in payload.items() if key not in ("rows", "columns")}
+    if fmt == "arrow":
+        return encode_arrow(columns, rows, meta)
+    return dumps_json({**meta, "columns": columns, "rows": [[row.get(column) for column in columns] for row in rows]})
+
+
+def cached_table_response(
+    request: Request,
+    fmt: str,
+    headers: dict,
+    cache_key: tuple,
+    version: int,
+) -> Response | None:
+    """The stored compressed body for ``cache_key`` at ``version``, if this worker has one.
+
+    Lets callers skip building the payload; :func:`table_response` with the
+    same key stores it.
+    """
+    encoding = negotiate_encoding(request)
+    if encoding is None:
+        return None
+    body = body_cache.get((*cache_key, fmt, encoding), version)
+    if body is None:
+        return None
+    headers = encoding_headers({**headers, "Vary": "Accept"}, encoding)
+    return Response(body, media_type=MEDIA_TYPES[fmt], headers=headers)
+
+
+def table_response(
+    request: Request,
+    payload: dict,
+    columns: list[str] | None = None,
+    headers: dict | None = None,
+    fmt: str | None = None,
+    cache_key: tuple | None = None,
+    version: int | None = None,
+) -> Response:
+    """Serialize a ``{"rows": [dict, ...], ...}`` payload in the format the client negotiated.
+
+    - json: the payload as is, encoded with orjson.
+    - columnar: ``columns`` once and each row as an array in that order.
+    - arrow: an Arrow IPC stream with one column per entry of ``columns``.
+    - ndjson: the other payload fields plus ``columns`` on the first line,
+      then one JSON object per row.
+
+    ``columns`` defaults to ``payload["columns"]``. Payloads without rows
+    (e.g. status messages) are always returned as JSON.
+
+    The body is compressed when the client accepts br or gzip, it is large
+    enough and the compression fits the CPU budget. Payloads identified by
+    ``cache_key`` and sync ``version`` are compressed regardless of the budget
+    and kept in ``body_cache`` for :func:`cached_table_response`.
+    """
+    fmt = fmt or negotiate_table_format(request)
+    headers = {**(headers or {}), "Vary": "Accept"}
+    rows = payload.get("rows")
+    columns = columns or payload.get("columns")
+    if rows is None or columns is None:
+        fmt = "json"
+    if fmt == "ndjson":
+        meta = {key: value for key, value in payload.items() if key not in ("rows", "columns")}
+        return ndjson_response(request, {**meta, "columns": columns}, rows, headers)
+    body = _encode_table(payload, columns, fmt)
+    encoding = negotiate_encoding(request)
+    compressed = None
+    if encoding:
+        cacheable = cache_key is not None and version is not None
+        compressed = compress_body(body, encoding, budget=not cacheable)
+        if compressed is not None and cacheable:
+            body_cache.put((*cache_key, fmt, encoding), version, compressed)
+    if compressed is None:
+        return Response(body, media_type=MEDIA_TYPES[fmt], headers=encoding_headers(headers, None))
+    return Response(compressed, media_type=MEDIA_TYPES[fmt], headers=encoding_headers(headers, encoding))
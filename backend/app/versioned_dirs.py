@@ -0,0 +1,10 @@
+import os
+
+
+def version_dirs(root: str) -> dict[int, str]:
+    """``v<version>`` directories under ``root`` by version number."""
+    versions = {}
+    for entry in os.listdir(root):
+        if entry.startswith("v") and entry[1:].isdigit() and os.path.isdir(os.path.join(root, entry)):
+            versions[int(entry[1:])] = os.path.join(root, entry)
+    return versions
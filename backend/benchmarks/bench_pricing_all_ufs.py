@@ -0,0 +1,103 @@
+# bench_pricing_all_ufs.py
+# Compares 27 sequential _compute_rows_from_db calls (one per UF) with
+# pricing every UF in one pass (_compute_all_uf_rows).
+# Usage (from backend/): python -m benchmarks.bench_pricing_all_ufs --items 5000
+import argparse
+import os
+import random
+
+os.environ.setdefault("DB_PORT", "3306")
+# Measures the database path; the in-memory snapshot would hide the repeated queries.
+os.environ.setdefault("PRICING_SNAPSHOT_ENABLED", "false")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.constants import UF_CODE_SET
+from app.db import Base
+from app.pricing_engine import discount_terms
+from app.routers.pricing_v2 import _compute_all_uf_rows, _compute_rows_from_db
+from benchmarks.bench_pricing_engine import CATEGORIA, CNPJ, PRICING_TABLES, PROGRAMA, _best_of, _random_discount
+
+UFS = sorted(UF_CODE_SET)
+
+
+def seed(db, items: int, rng: random.Random):
+    master, prog, cli, uf_rows = [], [], [], []
+    for i in range(items):
+        cod_item = f"IT{i:07d}"
+        pre_unit = rng.uniform(10, 5000)
+        for uf in UFS:
+            master.append(
+                {
+                    "uf": uf,
+                    "cod_item": cod_item,
+                    "den_item": f"ITEM {i}",
+                    "pre_unit": round(pre_unit * rng.uniform(0.95, 1.05), 2),
+                    "aliq_ipi": rng.choice([0.0, 5.0, 10.0, 15.0]),
+                    "iva": 0.0,
+                    "aliq_st": rng.choice([0.0, 8.5, 12.0]),
+                }
+            )
+            if rng.random() < 0.3:
+                desc_uf = _random_discount(rng)
+                desc_seq, desc_factors = discount_terms(desc_uf)
+                uf_rows.append({"cod_uf": uf, "cod_item": cod_item, "desc_uf": desc_uf, "desc_seq": desc_seq, "desc_factors": desc_factors})
+        if rng.random() < 0.8:
+            row = {
+                "programa": PROGRAMA,
+                "categoria": CATEGORIA,
+                "cod_item": cod_item,
+                "desc_base": _random_discount(rng),
+                "desc_redu": _random_discount(rng),
+                "desc_prog": _random_discount(rng),
+                "desc_camp": None,
+                "vald_camp": None,
+            }
+            row["desc_seq"], row["desc_factors"] = discount_terms(row["desc_base"], row["desc_redu"], row["desc_prog"])
+            row["camp_seq"], row["camp_factors"] = discount_terms(None)
+            prog.append(row)
+        if rng.random() < 0.05:
+            desc_cli = _random_discount(rng)
+            desc_seq, desc_factors = discount_terms(desc_cli)
+            cli.append({"cod_cliente": CNPJ, "cod_item": cod_item, "desc_cli": desc_cli, "desc_seq": desc_seq, "desc_factors": desc_factors})
+    db.bulk_insert_mappings(models.PricingMasterItem, master)
+    db.bulk_insert_mappings(models.PricingProgramItemDiscount, prog)
+    db.bulk_insert_mappings(models.PricingClientItemDiscount, cli)
+    db.bulk_insert_mappings(models.PricingUfItemDiscount, uf_rows)
+    db.commit()
+
+
+def sequential_rows(db) -> list[dict]:
+    rows = []
+    for uf in UFS:
+        rows += sorted(_compute_rows_from_db(db, CNPJ, uf, PROGRAMA, CATEGORIA)[2], key=lambda row: row["COD_ITEM"])
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=PRICING_TABLES)
+    db = sessionmaker(bind=engine)()
+    seed(db, args.items, random.Random(args.seed))
+
+    sequential_time, sequential = _best_of(lambda: sequential_rows(db), args.repeat)
+    single_time, single = _best_of(lambda: _compute_all_uf_rows(db, CNPJ, PROGRAMA, CATEGORIA), args.repeat)
+    if sequential != single:
+        raise SystemExit("ERROR: the per-UF calls and the single pass returned different results")
+
+    print(f"items: {args.items} x {len(UFS)} UFs ({len(single)} rows)")
+    print(f"27 calls:       {sequential_time * 1000:9.1f} ms")
+    print(f"single pass:    {single_time * 1000:9.1f} ms")
+    print(f"speedup:        {sequential_time / single_time:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
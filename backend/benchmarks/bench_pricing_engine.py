@@ -0,0 +1,196 @@
+# bench_pricing_engine.py
+# Compares the original _compute_rows_from_db loop with the vectorized engine.
+# Usage (from backend/): python -m benchmarks.bench_pricing_engine --items 20000
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DB_PORT", "3306")
+# Without the pricing_sync_state table the snapshot would only log errors.
+os.environ.setdefault("PRICING_SNAPSHOT_ENABLED", "false")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.db import Base
+from app.pricing_engine import campaign_valid, discount_terms, format_discount_seq, parse_discount_seq
+from app.routers.pricing_v2 import _compute_rows_from_db
+
+PRICING_TABLES = [
+    models.PricingMasterItem.__table__,
+    models.PricingProgramItemDiscount.__table__,
+    models.PricingClientItemDiscount.__table__,
+    models.PricingUfItemDiscount.__table__,
+]
+CNPJ = "058352792000143"
+UF = "SP"
+PROGRAMA = "DEEPDIVE"
+CATEGORIA = "OURO"
+
+
+def legacy_compute_rows(db, cnpj: str, uf: str, programa: str, categoria: str) -> list[dict]:
+    base_items = db.query(models.PricingMasterItem).filter(models.PricingMasterItem.uf == uf).all()
+    pmap = {
+        item.cod_item: item
+        for item in db.query(models.PricingProgramItemDiscount).filter(
+            models.PricingProgramItemDiscount.programa == programa,
+            models.PricingProgramItemDiscount.categoria == categoria,
+        ).all()
+    }
+    cmap = {
+        item.cod_item: item
+        for item in db.query(models.PricingClientItemDiscount).filter(
+            models.PricingClientItemDiscount.cod_cliente == cnpj
+        ).all()
+    }
+    umap = {
+        item.cod_item: item
+        for item in db.query(models.PricingUfItemDiscount).filter(
+            models.PricingUfItemDiscount.cod_uf == uf
+        ).all()
+    }
+
+    rows = []
+    for item in base_items:
+        cod_item = item.cod_item
+        seq = []
+
+        p = pmap.get(cod_item)
+        if p is not None:
+            seq += parse_discount_seq(p.desc_base)
+            seq += parse_discount_seq(p.desc_redu)
+            seq += parse_discount_seq(p.desc_prog)
+            if campaign_valid(p.vald_camp):
+                seq += parse_discount_seq(p.desc_camp)
+
+        c = cmap.get(cod_item)
+        if c is not None:
+            seq += parse_discount_seq(c.desc_cli)
+
+        u = umap.get(cod_item)
+        if u is not None:
+            seq += parse_discount_seq(u.desc_uf)
+
+        price = float(item.pre_unit or 0.0)
+        for pct in seq:
+            price = price * (1 - (pct / 100.0))
+
+        aliq_ipi = float(item.aliq_ipi or 0.0)
+        aliq_st = float(item.aliq_st or 0.0)
+        valor_ipi = price * (aliq_ipi / 100.0)
+        valor_st = price * (aliq_st / 100.0)
+
+        rows.append(
+            {
+                "UF": uf,
+                "COD_ITEM": cod_item,
+                "DEN_ITEM": item.den_item,
+                "PRE_UNIT": round(float(item.pre_unit or 0.0), 2),
+                "DESCONTOS_CASCATA": format_discount_seq(seq),
+                "BASE_LIQUIDA": round(price, 2),
+                "ALIQ_IPI": aliq_ipi,
+                "ALIQ_ST": aliq_st,
+                "VALOR_IPI": round(valor_ipi, 2),
+                "VALOR_ST": round(valor_st, 2),
+                "VALOR_FINAL": round(price + valor_ipi + valor_st, 2),
+                "PROGRAMA": programa,
+                "CATEGORIA": categoria,
+            }
+        )
+    return rows
+
+
+def _random_discount(rng: random.Random) -> str | None:
+    choice = rng.random()
+    if choice < 0.2:
+        return None
+    if choice < 0.6:
+        return str(rng.choice([5, 10, 12.5, 15, 20]))
+    return "+".join(str(rng.choice([2, 3, 5, 7.5, 10])) for _ in range(rng.randint(2, 4)))
+
+
+def seed(db, items: int, rng: random.Random):
+    today = datetime.utcnow()
+    master, prog, cli, uf = [], [], [], []
+    for i in range(items):
+        cod_item = f"IT{i:07d}"
+        master.append(
+            {
+                "uf": UF,
+                "cod_item": cod_item,
+                "den_item": f"ITEM {i}",
+                "pre_unit": round(rng.uniform(10, 5000), 2),
+                "aliq_ipi": rng.choice([0.0, 5.0, 10.0, 15.0]),
+                "iva": 0.0,
+                "aliq_st": rng.choice([0.0, 8.5, 12.0]),
+            }
+        )
+        if rng.random() < 0.8:
+            row = {
+                "programa": PROGRAMA,
+                "categoria": CATEGORIA,
+                "cod_item": cod_item,
+                "desc_base": _random_discount(rng),
+                "desc_redu": _random_discount(rng),
+                "desc_prog": _random_discount(rng),
+                "desc_camp": _random_discount(rng),
+                "vald_camp": rng.choice([None, today - timedelta(days=30), today + timedelta(days=30)]),
+            }
+            row["desc_seq"], row["desc_factors"] = discount_terms(row["desc_base"], row["desc_redu"], row["desc_prog"])
+            row["camp_seq"], row["camp_factors"] = discount_terms(row["desc_camp"])
+            prog.append(row)
+        if rng.random() < 0.05:
+            desc_cli = _random_discount(rng)
+            desc_seq, desc_factors = discount_terms(desc_cli)
+            cli.append({"cod_cliente": CNPJ, "cod_item": cod_item, "desc_cli": desc_cli, "desc_seq": desc_seq, "desc_factors": desc_factors})
+        if rng.random() < 0.3:
+            desc_uf = _random_discount(rng)
+            desc_seq, desc_factors = discount_terms(desc_uf)
+            uf.append({"cod_uf": UF, "cod_item": cod_item, "desc_uf": desc_uf, "desc_seq": desc_seq, "desc_factors": desc_factors})
+    db.bulk_insert_mappings(models.PricingMasterItem, master)
+    db.bulk_insert_mappings(models.PricingProgramItemDiscount, prog)
+    db.bulk_insert_mappings(models.PricingClientItemDiscount, cli)
+    db.bulk_insert_mappings(models.PricingUfItemDiscount, uf)
+    db.commit()
+
+
+def _best_of(fn, repeat: int) -> tuple[float, list[dict]]:
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=PRICING_TABLES)
+    db = sessionmaker(bind=engine)()
+    seed(db, args.items, random.Random(args.seed))
+
+    legacy_time, legacy_rows = _best_of(lambda: legacy_compute_rows(db, CNPJ, UF, PROGRAMA, CATEGORIA), args.repeat)
+    engine_time, engine_rows = _best_of(lambda: _compute_rows_from_db(db, CNPJ, UF, PROGRAMA, CATEGORIA)[2], args.repeat)
+
+    if legacy_rows != engine_rows:
+        raise SystemExit("ERROR: the loop and the vectorized engine returned different results")
+
+    print(f"items: {args.items}")
+    print(f"loop:     {legacy_time * 1000:9.1f} ms")
+    print(f"engine:   {engine_time * 1000:9.1f} ms")
+    print(f"speedup:  {legacy_time / engine_time:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
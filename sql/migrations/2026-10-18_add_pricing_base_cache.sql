@@ -0,0 +1,23 @@
+CREATE TABLE IF NOT EXISTS pricing_base_cache (
+  id INT AUTO_INCREMENT PRIMARY KEY,
+  uf CHAR(2) NOT NULL,
+  cod_item VARCHAR(30) NOT NULL,
+  den_item VARCHAR(255),
+  pre_unit DECIMAL(18,6) NOT NULL DEFAULT 0,
+  descontos_cascata VARCHAR(255),
+  base_liquida DECIMAL(18,6) NOT NULL DEFAULT 0,
+  aliq_ipi DECIMAL(10,6) NOT NULL DEFAULT 0,
+  aliq_st DECIMAL(10,6) NOT NULL DEFAULT 0,
+  valor_ipi DECIMAL(18,6) NOT NULL DEFAULT 0,
+  valor_st DECIMAL(18,6) NOT NULL DEFAULT 0,
+  valor_final DECIMAL(18,6) NOT NULL DEFAULT 0,
+  programa VARCHAR(60) NOT NULL,
+  categoria VARCHAR(60) NOT NULL,
+  source VARCHAR(30) NOT NULL DEFAULT 'db',
+  updated_at DATETIME NOT NULL,
+  UNIQUE KEY uq_pricing_base_cache_uf_prog_cat_item (uf, programa, categoria, cod_item)
+);
+
+-- pricing_result_cache now only holds per-client overrides; full per-client
+-- copies written before this change are dropped and rebuilt on demand.
+DELETE FROM pricing_result_cache;
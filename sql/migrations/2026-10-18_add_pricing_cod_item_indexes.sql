@@ -0,0 +1,5 @@
+ALTER TABLE pricing_master_items
+ADD KEY ix_pricing_master_cod_item_uf (cod_item, uf);
+
+ALTER TABLE pricing_uf_item_discounts
+ADD KEY ix_pricing_uf_item_cod_item (cod_item);
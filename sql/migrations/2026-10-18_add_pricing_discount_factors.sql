@@ -0,0 +1,13 @@
+ALTER TABLE pricing_program_item_discounts
+ADD COLUMN desc_seq VARCHAR(255) NULL AFTER vald_camp,
+ADD COLUMN desc_factors TEXT NULL AFTER desc_seq,
+ADD COLUMN camp_seq VARCHAR(100) NULL AFTER desc_factors,
+ADD COLUMN camp_factors TEXT NULL AFTER camp_seq;
+
+ALTER TABLE pricing_client_item_discounts
+ADD COLUMN desc_seq VARCHAR(100) NULL AFTER desc_cli,
+ADD COLUMN desc_factors TEXT NULL AFTER desc_seq;
+
+ALTER TABLE pricing_uf_item_discounts
+ADD COLUMN desc_seq VARCHAR(100) NULL AFTER desc_uf,
+ADD COLUMN desc_factors TEXT NULL AFTER desc_seq;
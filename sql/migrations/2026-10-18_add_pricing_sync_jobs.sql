@@ -0,0 +1,16 @@
+CREATE TABLE IF NOT EXISTS pricing_sync_jobs (
+  id INT AUTO_INCREMENT PRIMARY KEY,
+  mode VARCHAR(20) NOT NULL,
+  status ENUM('queued', 'running', 'succeeded', 'failed') NOT NULL DEFAULT 'queued',
+  phase VARCHAR(30),
+  rows_processed INT NOT NULL DEFAULT 0,
+  result TEXT,
+  error VARCHAR(500),
+  requested_by INT NULL,
+  created_at DATETIME NOT NULL,
+  started_at DATETIME NULL,
+  updated_at DATETIME NOT NULL,
+  finished_at DATETIME NULL,
+  KEY ix_pricing_sync_jobs_status (status),
+  CONSTRAINT fk_pricing_sync_jobs_user FOREIGN KEY (requested_by) REFERENCES users(id) ON DELETE SET NULL
+);
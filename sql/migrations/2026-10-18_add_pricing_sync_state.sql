@@ -0,0 +1,7 @@
+CREATE TABLE IF NOT EXISTS pricing_sync_state (
+  id INT PRIMARY KEY,
+  version INT NOT NULL DEFAULT 0,
+  updated_at DATETIME NULL
+);
+
+INSERT IGNORE INTO pricing_sync_state (id, version, updated_at) VALUES (1, 0, NOW());
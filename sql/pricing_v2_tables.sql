@@ -13,7 +13,8 @@ CREATE TABLE IF NOT EXISTS pricing_master_items (
   aliq_ipi DECIMAL(10,6) NOT NULL DEFAULT 0,
   iva DECIMAL(10,6) NOT NULL DEFAULT 0,
   aliq_st DECIMAL(10,6) NOT NULL DEFAULT 0,
-  KEY ix_pricing_master_uf_cod_item (uf, cod_item)
+  KEY ix_pricing_master_uf_cod_item (uf, cod_item),
+  KEY ix_pricing_master_cod_item_uf (cod_item, uf)
 );
 
 CREATE TABLE IF NOT EXISTS pricing_client_programs (
@@ -37,6 +38,10 @@ CREATE TABLE IF NOT EXISTS pricing_program_item_discounts (
   desc_prog VARCHAR(100),
   desc_camp VARCHAR(100),
   vald_camp DATETIME NULL,
+  desc_seq VARCHAR(255),
+  desc_factors TEXT,
+  camp_seq VARCHAR(100),
+  camp_factors TEXT,
   KEY ix_pricing_program_item_programa_categoria_item (programa, categoria, cod_item)
 );
 
@@ -46,6 +51,8 @@ CREATE TABLE IF NOT EXISTS pricing_client_item_discounts (
   cod_cliente VARCHAR(20) NOT NULL,
   cod_item VARCHAR(30) NOT NULL,
   desc_cli VARCHAR(100),
+  desc_seq VARCHAR(100),
+  desc_factors TEXT,
   KEY ix_pricing_client_item_cod_cliente_item (cod_cliente, cod_item)
 );
 
@@ -55,7 +62,10 @@ CREATE TABLE IF NOT EXISTS pricing_uf_item_discounts (
   cod_uf CHAR(2) NOT NULL,
   cod_item VARCHAR(30) NOT NULL,
   desc_uf VARCHAR(100),
-  KEY ix_pricing_uf_item_cod_uf_item (cod_uf, cod_item)
+  desc_seq VARCHAR(100),
+  desc_factors TEXT,
+  KEY ix_pricing_uf_item_cod_uf_item (cod_uf, cod_item),
+  KEY ix_pricing_uf_item_cod_item (cod_item)
 );
 
 CREATE TABLE IF NOT EXISTS pricing_result_cache (
@@ -78,4 +88,49 @@ CREATE TABLE IF NOT EXISTS pricing_result_cache (
   updated_at DATETIME NOT NULL,
   UNIQUE KEY uq_pricing_cache_cnpj_uf_prog_cat_item (cnpj, uf, programa, categoria, cod_item),
   KEY ix_pricing_cache_cnpj_uf (cnpj, uf)
-);
\ No newline at end of file
+);
+
+CREATE TABLE IF NOT EXISTS pricing_base_cache (
+  id INT AUTO_INCREMENT PRIMARY KEY,
+  uf CHAR(2) NOT NULL,
+  cod_item VARCHAR(30) NOT NULL,
+  den_item VARCHAR(255),
+  pre_unit DECIMAL(18,6) NOT NULL DEFAULT 0,
+  descontos_cascata VARCHAR(255),
+  base_liquida DECIMAL(18,6) NOT NULL DEFAULT 0,
+  aliq_ipi DECIMAL(10,6) NOT NULL DEFAULT 0,
+  aliq_st DECIMAL(10,6) NOT NULL DEFAULT 0,
+  valor_ipi DECIMAL(18,6) NOT NULL DEFAULT 0,
+  valor_st DECIMAL(18,6) NOT NULL DEFAULT 0,
+  valor_final DECIMAL(18,6) NOT NULL DEFAULT 0,
+  programa VARCHAR(60) NOT NULL,
+  categoria VARCHAR(60) NOT NULL,
+  source VARCHAR(30) NOT NULL DEFAULT 'db',
+  updated_at DATETIME NOT NULL,
+  UNIQUE KEY uq_pricing_base_cache_uf_prog_cat_item (uf, programa, categoria, cod_item)
+);
+
+CREATE TABLE IF NOT EXISTS pricing_sync_state (
+  id INT PRIMARY KEY,
+  version INT NOT NULL DEFAULT 0,
+  updated_at DATETIME NULL
+);
+
+INSERT IGNORE INTO pricing_sync_state (id, version, updated_at) VALUES (1, 0, NOW());
+
+CREATE TABLE IF NOT EXISTS pricing_sync_jobs (
+  id INT AUTO_INCREMENT PRIMARY KEY,
+  mode VARCHAR(20) NOT NULL,
+  status ENUM('queued', 'running', 'succeeded', 'failed') NOT NULL DEFAULT 'queued',
+  phase VARCHAR(30),
+  rows_processed INT NOT NULL DEFAULT 0,
+  result TEXT,
+  error VARCHAR(500),
+  requested_by INT NULL,
+  created_at DATETIME NOT NULL,
+  started_at DATETIME NULL,
+  updated_at DATETIME NOT NULL,
+  finished_at DATETIME NULL,
+  KEY ix_pricing_sync_jobs_status (status),
+  CONSTRAINT fk_pricing_sync_jobs_user FOREIGN KEY (requested_by) REFERENCES users(id) ON DELETE SET NULL
+);